@@ -1,16 +1,19 @@
+import asyncio
 import uuid
 from typing import Annotated
 from fastapi import (APIRouter, Depends, HTTPException, status, Query, BackgroundTasks,
                      WebSocket, Path, WebSocketDisconnect)
-from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-import io
 
 from .. import services
+from ..services import alert_pipeline, cost_matrix, graph_tiles, ml_engine, model_training, pareto_router, report_generator, report_jobs, risk_feed, risk_rescoring, route_encoding
 from ..db import crud, database, models
 from ..api import schemas, dependencies, websockets
 from ..core import security
+from ..core.config import settings
 
 router = APIRouter(prefix="/api/v1")
 
@@ -40,28 +43,110 @@ def list_users(db: Session = Depends(database.get_db)):
     return crud.get_all_users(db)
 
 # --- Block 4 & 8: Core Routing API ---
-@router.post("/get_route", response_model=schemas.RouteResponse, dependencies=[Depends(dependencies.is_operator_or_commander)], tags=["Core API"])
+@router.post("/get_route", response_model=schemas.RouteResponse | schemas.CompactRouteResponse, response_class=ORJSONResponse, dependencies=[Depends(dependencies.is_operator_or_commander)], tags=["Core API"])
 def get_optimized_route(request: schemas.RouteRequest, db: Session = Depends(database.get_db)):
-    graph = services.route_optimizer.build_weighted_graph(db, request.mode)
-    start_node = services.route_optimizer.find_nearest_node(graph, (request.start_lon, request.start_lat))
-    end_node = services.route_optimizer.find_nearest_node(graph, (request.end_lon, request.end_lat))
-    path_nodes = services.route_optimizer.find_astar_path(graph, start_node, end_node)
+    graph, path = services.route_optimizer.plan_route(
+        db, (request.start_lon, request.start_lat), (request.end_lon, request.end_lat), request.mode)
     
-    if not path_nodes:
+    if not path:
         raise HTTPException(status_code=404, detail="No path found.")
         
-    path_details = services.route_optimizer.get_path_details(graph, path_nodes)
+    path_nodes = graph.node_coordinates(path.nodes)
+    path_details = graph.path_details(path)
     # Mocking external map service integration and fuel calculation
     fuel_estimate = (path_details['total_distance'] / 1000) * 0.2 # 0.2L per km
-    heatmap_data = [[seg['risk_score'], *graph.nodes[node]['pos']] for node in path_nodes for seg in path_details['segments']]
-    
-    return {
-        "path_geometry": {"type": "LineString", "coordinates": path_nodes},
-        "total_distance_km": path_details['total_distance'] / 1000,
-        "estimated_fuel_liters": fuel_estimate,
-        "segments": path_details['segments'],
-        "risk_heatmap": heatmap_data
-    }
+
+    # The payload is built from trusted internal data, so hand it straight to orjson
+    # instead of re-validating it against the response model.
+    if request.compact:
+        return ORJSONResponse(route_encoding.build_compact_route_response(
+            path_nodes, path_details, fuel_estimate, include_heatmap=request.include_heatmap))
+    return ORJSONResponse(route_encoding.build_route_response(path_nodes, path_details, fuel_estimate))
+
+@router.post("/get_route_tradeoffs", response_model=schemas.RouteTradeoffResponse, response_class=ORJSONResponse, dependencies=[Depends(dependencies.is_operator_or_commander)], tags=["Core API"])
+def get_route_tradeoffs(request: schemas.RouteTradeoffRequest, db: Session = Depends(database.get_db)):
+    """Distance vs. risk Pareto frontier from one search, plus each mode's route on it."""
+    start, end = (request.start_lon, request.start_lat), (request.end_lon, request.end_lat)
+    risk_weights = services.route_optimizer.MODE_RISK_WEIGHTS
+    for graph in services.route_optimizer.routing_graphs(db, [start, end]):
+        if graph.node_count == 0:
+            continue
+        start_node, end_node = graph.nearest_node(*start), graph.nearest_node(*end)
+        frontier = pareto_router.pareto_routes(graph, start_node, end_node, risk_epsilon=request.risk_epsilon,
+                                               max_detour=request.max_detour,
+                                               max_risk_weight=max(risk_weights.values()))
+        if frontier.routes:
+            break
+    else:
+        raise HTTPException(status_code=404, detail="No path found.")
+
+    frontier_routes = frontier.routes
+    if request.risk_epsilon == 0 and not frontier.truncated:
+        # An exact frontier already holds the route /get_route returns for every mode
+        mode_indices = {mode: pareto_router.select_route(frontier_routes, weight) for mode, weight in risk_weights.items()}
+    else:
+        # An epsilon or truncated frontier may have skipped them; fall back to one search per mode
+        frontier_routes, mode_indices = pareto_router.add_mode_routes(graph, start_node, end_node,
+                                                                      frontier_routes, risk_weights)
+    kept = pareto_router.thin_frontier(frontier_routes, request.max_routes, set(mode_indices.values()))
+    position = {index: i for i, index in enumerate(kept)}
+    routes = [{
+        "total_distance_km": frontier_routes[i].distance / 1000,
+        "total_risk": frontier_routes[i].risk,
+        "path_polyline": route_encoding.encode_polyline(graph.node_coordinates(frontier_routes[i].path.nodes)),
+        "segment_ids": graph.path_segment_ids(frontier_routes[i].path),
+    } for i in kept]
+    return ORJSONResponse({
+        "routes": routes,
+        "mode_routes": {mode: position[index] for mode, index in mode_indices.items()},
+        "frontier_size": len(frontier_routes),
+        "truncated": frontier.truncated,
+    })
+
+@router.post("/cost_matrix", response_model=schemas.CostMatrixResponse, response_class=ORJSONResponse, dependencies=[Depends(dependencies.is_operator_or_commander)], tags=["Core API"])
+def get_cost_matrix(request: schemas.CostMatrixRequest, db: Session = Depends(database.get_db)):
+    """Source x target travel costs from one shortest-path tree per source."""
+    points = [(point.lon, point.lat) for point in request.sources + request.targets]
+    matrix = None
+    # Widen the corridor until every pair is connected or the corridor is at its widest
+    for graph in services.route_optimizer.routing_graphs(db, points):
+        if graph.node_count == 0:
+            continue
+        source_nodes = [graph.nearest_node(point.lon, point.lat) for point in request.sources]
+        target_nodes = [graph.nearest_node(point.lon, point.lat) for point in request.targets]
+        matrix = cost_matrix.compute_cost_matrix(graph, source_nodes, target_nodes,
+                                                 services.route_optimizer.get_risk_weight(request.mode))
+        if all(cost is not None for row in matrix.cost for cost in row):
+            break
+    if matrix is None:
+        raise HTTPException(status_code=404, detail="Road network is empty.")
+    return ORJSONResponse({
+        "cost": matrix.cost,
+        "distance_km": [[None if d is None else d / 1000 for d in row] for row in matrix.distance],
+        "risk": matrix.risk,
+    })
+
+@router.post("/reachability", response_model=schemas.ReachabilityResponse, response_class=ORJSONResponse, dependencies=[Depends(dependencies.is_operator_or_commander)], tags=["Core API"])
+def get_reachable_segments(request: schemas.ReachabilityRequest, db: Session = Depends(database.get_db)):
+    """
+    Every segment reachable from any source within the budget, from a single multi-source search.
+    Without a graph snapshot the search covers the corridor tiles around the sources, at most
+    TILE_MAX_CORRIDOR_MARGIN tiles out (the whole margin for the "risk" metric).
+    """
+    points = [(point.lon, point.lat) for point in request.sources]
+    margin = settings.tile_max_corridor_margin
+    if request.metric != "risk":
+        # Distance never exceeds a "distance" or "cost" budget, so it bounds how far the search can go
+        margin = graph_tiles.margin_for_distance(points, request.budget)
+    graph = next(services.route_optimizer.routing_graphs(db, points, margin))
+    if graph.node_count == 0:
+        raise HTTPException(status_code=404, detail="Road network is empty.")
+    source_nodes = [graph.nearest_node(point.lon, point.lat) for point in request.sources]
+    distance_weight, risk_weight = cost_matrix.metric_weights(
+        request.metric, services.route_optimizer.get_risk_weight(request.mode))
+    segment_ids, reach_cost = cost_matrix.reachable_segments(graph, source_nodes, request.budget,
+                                                             distance_weight, risk_weight)
+    return ORJSONResponse({"segment_ids": segment_ids, "reach_cost": reach_cost})
 
 # --- Block 6 & 8: Threat Intelligence ---
 @router.post("/update_threat", status_code=201, response_model=schemas.ThreatIncident, dependencies=[Depends(dependencies.is_analyst_or_commander)], tags=["Core API"])
@@ -87,9 +172,13 @@ def get_threat_heatmap_data(db: Session = Depends(database.get_db)):
 def get_active_alerts(db: Session = Depends(database.get_db)):
     return crud.get_alerts_by_status(db, status=models.AlertStatus.ACTIVE)
 
+@router.get("/alerts/count", dependencies=[Depends(dependencies.is_operator_or_commander)], tags=["Alerts"])
+def get_active_alert_count(db: Session = Depends(database.get_db)):
+    return {"active": alert_pipeline.alert_pipeline.active_count(db)}
+
 @router.post("/alerts/acknowledge/{alert_id}", status_code=200, dependencies=[Depends(dependencies.is_operator_or_commander)], tags=["Alerts"])
 def acknowledge_alert(alert_id: int, db: Session = Depends(database.get_db)):
-    alert = crud.update_alert_status(db, alert_id, models.AlertStatus.ACKNOWLEDGED)
+    alert = alert_pipeline.alert_pipeline.acknowledge(db, alert_id)
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found.")
     return {"message": f"Alert {alert_id} has been acknowledged."}
@@ -119,21 +208,129 @@ async def websocket_endpoint(websocket: WebSocket, convoy_id: uuid.UUID = Path(.
     except WebSocketDisconnect:
         websockets.manager.disconnect(convoy_id, websocket)
 
+@router.websocket("/ws/risk_feed")
+async def risk_feed_endpoint(websocket: WebSocket, since: int | None = None, bbox: str | None = None):
+    """
+    Streams segment risk deltas as {"type": "delta", "events": [[version, segment_id, score, category], ...]}.
+    Pass the last seen version as `since` to resume, against any worker; {"type": "resync"}
+    means reload state first. `bbox` is "min_lon,min_lat,max_lon,max_lat". Changes reach
+    subscribers within one feed poll interval of being written.
+    """
+    try:
+        bounds = tuple(float(v) for v in bbox.split(",")) if bbox else None
+        if bounds is not None and len(bounds) != 4:
+            raise ValueError
+    except ValueError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="bbox must be min_lon,min_lat,max_lon,max_lat")
+        return
+    await websocket.accept()
+    subscription, backlog = risk_feed.risk_feed.subscribe(bounds, since)
+    receiver = getter = None
+    try:
+        await websocket.send_json({"type": "hello", "version": risk_feed.risk_feed.version})
+        if backlog is None:
+            await websocket.send_json({"type": "resync", "version": risk_feed.risk_feed.version})
+            last_sent = 0
+        elif backlog:
+            await websocket.send_json({"type": "delta", "events": [event.compact() for event in backlog]})
+            last_sent = backlog[-1].version
+        else:
+            last_sent = since or 0
+
+        receiver = asyncio.ensure_future(websocket.receive_text()) # Only used to notice disconnects
+        getter = asyncio.ensure_future(subscription.queue.get())
+        while True:
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            # Handle a finished getter before the receiver: both can complete in the same wait,
+            # and dropping the getter then would lose its batch without the client noticing
+            if getter in done:
+                batch = getter.result()
+                getter = asyncio.ensure_future(subscription.queue.get())
+                if subscription.overflowed:
+                    # Client fell too far behind; drop the backlog and have it reload
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    subscription.overflowed = False
+                    await websocket.send_json({"type": "resync", "version": risk_feed.risk_feed.version})
+                else:
+                    events = [event.compact() for event in batch if event.version > last_sent]
+                    if events:
+                        last_sent = events[-1][0]
+                        await websocket.send_json({"type": "delta", "events": events})
+            if receiver in done:
+                receiver.result() # Raises WebSocketDisconnect
+                receiver = asyncio.ensure_future(websocket.receive_text())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for future in (receiver, getter):
+            if future is not None:
+                future.cancel()
+        risk_feed.risk_feed.unsubscribe(subscription)
+
 # --- Block 7: Mission Reports & System Status ---
 @router.get("/missions", response_model=list[schemas.CompletedMission], dependencies=[Depends(dependencies.is_analyst_or_commander)], tags=["Mission Reports"])
 def list_completed_missions(db: Session = Depends(database.get_db)):
     return crud.get_all_completed_missions(db)
 
+@router.get("/missions/export", dependencies=[Depends(dependencies.is_analyst_or_commander)], tags=["Mission Reports"])
+def export_missions_csv(mission_ids: Annotated[list[int] | None, Query()] = None):
+    """Streams the alerts of many missions (all of them if no ids are given) as a single CSV."""
+    def rows():
+        # The request-scoped session may be closed before streaming finishes, so use our own.
+        db = database.SessionLocal()
+        try:
+            missions = crud.iter_completed_missions(db, mission_ids)
+            yield from report_generator.iter_bulk_missions_csv(missions)
+        finally:
+            db.close()
+    return StreamingResponse(rows(), media_type="text/csv",
+                             headers={"Content-Disposition": 'attachment; filename="missions_alerts.csv"'})
+
 @router.get("/missions/{mission_id}/report", dependencies=[Depends(dependencies.is_analyst_or_commander)], tags=["Mission Reports"])
 def generate_mission_report(mission_id: int, format: str = "pdf", db: Session = Depends(database.get_db)):
     mission = crud.get_completed_mission(db, mission_id)
     if not mission:
         raise HTTPException(status_code=404, detail="Mission not found.")
-    if format == "pdf":
-        pdf_bytes = services.report_generator.create_mission_pdf(mission)
-        return StreamingResponse(io.BytesIO(pdf_bytes), media_type="application/pdf")
-    # (CSV logic would be similar)
-    raise HTTPException(status_code=400, detail="Unsupported format.")
+    if format == "csv":
+        return StreamingResponse(report_generator.iter_mission_csv(mission.alerts_triggered), media_type="text/csv",
+                                 headers={"Content-Disposition": f'attachment; filename="mission_{mission_id}_alerts.csv"'})
+    if format not in report_jobs.REPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported format.")
+    cached_path = report_jobs.report_job_manager.get_cached_artifact(mission, format)
+    if cached_path:
+        media_type, _ = report_jobs.REPORT_FORMATS[format]
+        return FileResponse(cached_path, media_type=media_type)
+    # Not rendered yet: queue it and let the client poll the job.
+    job = report_jobs.report_job_manager.submit(mission, format)
+    return JSONResponse(status_code=202, content=jsonable_encoder(job))
+
+@router.post("/missions/{mission_id}/report_jobs", status_code=202, response_model=schemas.ReportJob, dependencies=[Depends(dependencies.is_analyst_or_commander)], tags=["Mission Reports"])
+def queue_mission_report(mission_id: int, format: str = "pdf", db: Session = Depends(database.get_db)):
+    if format not in report_jobs.REPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported format.")
+    mission = crud.get_completed_mission(db, mission_id)
+    if not mission:
+        raise HTTPException(status_code=404, detail="Mission not found.")
+    return report_jobs.report_job_manager.submit(mission, format)
+
+@router.get("/report_jobs/{job_id}", response_model=schemas.ReportJob, dependencies=[Depends(dependencies.is_analyst_or_commander)], tags=["Mission Reports"])
+def get_report_job(job_id: str):
+    job = report_jobs.report_job_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found.")
+    return job
+
+@router.get("/report_jobs/{job_id}/download", dependencies=[Depends(dependencies.is_analyst_or_commander)], tags=["Mission Reports"])
+def download_report(job_id: str):
+    job = report_jobs.report_job_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found.")
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Report is not ready (status: {job.status}).")
+    media_type, _ = report_jobs.REPORT_FORMATS[job.format]
+    return FileResponse(report_jobs.report_job_manager.artifact_path(job.id, job.format), media_type=media_type,
+                        filename=f"mission_{job.mission_id}_report.{job.format}")
 
 @router.get("/system_status", tags=["System Status"])
 def get_system_status(db: Session = Depends(database.get_db)):
@@ -146,10 +343,32 @@ async def simulate_random_mission(background_tasks: BackgroundTasks, db: Session
     # ... Implementation from Block 8 ...
     return {"message": "New mission simulation started."}
 
+@router.post("/rescore_risk", status_code=202, dependencies=[Depends(dependencies.is_commander)], tags=["Simulation"])
+def trigger_risk_rescoring(background_tasks: BackgroundTasks):
+    background_tasks.add_task(risk_rescoring.run_rescoring)
+    return {"message": "Network risk rescoring started."}
+
+@router.post("/ml/train", status_code=202, dependencies=[Depends(dependencies.is_commander)], tags=["Simulation"])
+def start_model_training():
+    pid = ml_engine.train_new_model()
+    return {"message": "Model training started.", "pid": pid}
+
+@router.get("/ml/model", dependencies=[Depends(dependencies.is_analyst_or_commander)], tags=["Simulation"])
+def get_model_info():
+    model = ml_engine.model_registry.current()
+    return {
+        "serving_version": model.version if model else None,
+        "active_version": ml_engine.read_active_version(),
+        "available_versions": ml_engine.list_model_versions(),
+        "feature_names": list(model.feature_names) if model else [],
+        "training_in_progress": model_training.is_training(),
+    }
+
 @router.post("/reset_demo", dependencies=[Depends(dependencies.is_commander)], tags=["Simulation"])
 def reset_demo_environment(db: Session = Depends(database.get_db)):
     services.convoy_manager.clear_all_convoys()
     crud.clear_all_threats(db)
     crud.clear_all_alerts(db)
+    alert_pipeline.alert_pipeline.reset()
     crud.reset_all_risk_scores(db)
     return {"message": "Demonstration environment has been reset."}
\ No newline at end of file
@@ -47,6 +47,8 @@ class RouteRequest(BaseModel):
     end_lat: float
     end_lon: float
     mode: str = Field("balance", pattern="^(stealth|speed|balance)$")
+    compact: bool = False # Encoded polyline + columnar segment arrays
+    include_heatmap: bool = False # Compact mode only; the full response always carries the heatmap
 
 class SegmentDetail(BaseModel):
     segment_id: int
@@ -58,7 +60,63 @@ class RouteResponse(BaseModel):
     total_distance_km: float
     estimated_fuel_liters: float
     segments: list[SegmentDetail]
-    risk_heatmap: list[list[float]]
+    risk_heatmap: list[list[float]] # One [risk, lon, lat] point per segment
+
+class CompactRouteResponse(BaseModel):
+    encoding: str # e.g. "polyline5"
+    path_polyline: str
+    total_distance_km: float
+    estimated_fuel_liters: float
+    segment_ids: list[int]
+    segment_distances_km: list[float]
+    segment_risks: list[float]
+    risk_heatmap: list[list[float]] | None = None
+
+class RouteTradeoffRequest(BaseModel):
+    start_lat: float
+    start_lon: float
+    end_lat: float
+    end_lon: float
+    risk_epsilon: float = Field(0.0, ge=0.0) # Risks closer than this count as equal; 0 = exact frontier
+    max_detour: float = Field(1.5, ge=1.0, le=5.0) # Longest route on the frontier, relative to the shortest
+    max_routes: int = Field(20, ge=3, le=200) # Frontier is thinned to this many routes; at least one per mode, which are always kept
+
+class TradeoffRoute(BaseModel):
+    total_distance_km: float
+    total_risk: float
+    path_polyline: str
+    segment_ids: list[int]
+
+class RouteTradeoffResponse(BaseModel):
+    routes: list[TradeoffRoute] # Increasing distance, decreasing risk
+    mode_routes: dict[str, int] # Mode -> index into routes
+    frontier_size: int
+    truncated: bool
+
+class Coordinate(BaseModel):
+    lat: float
+    lon: float
+
+class CostMatrixRequest(BaseModel):
+    sources: list[Coordinate] = Field(..., min_length=1, max_length=100)
+    targets: list[Coordinate] = Field(..., min_length=1, max_length=2000)
+    mode: str = Field("balance", pattern="^(stealth|speed|balance)$")
+
+class CostMatrixResponse(BaseModel):
+    # Row per source, column per target; null where the target is unreachable
+    cost: list[list[float | None]]
+    distance_km: list[list[float | None]]
+    risk: list[list[float | None]]
+
+class ReachabilityRequest(BaseModel):
+    sources: list[Coordinate] = Field(..., min_length=1, max_length=100)
+    budget: float = Field(..., gt=0) # Meters for "distance", danger_score units for "risk", mode cost for "cost"
+    metric: str = Field("distance", pattern="^(distance|risk|cost)$")
+    mode: str = Field("balance", pattern="^(stealth|speed|balance)$")
+
+class ReachabilityResponse(BaseModel):
+    segment_ids: list[int]
+    reach_cost: list[float] # Budget consumed to reach the far end of each segment
 
 # Alert Schemas (Block 3)
 class Alert(BaseModel):
@@ -104,6 +162,15 @@ class CompletedMission(BaseModel):
     class Config:
         from_attributes = True
 
+class ReportJob(BaseModel):
+    id: str # Content hash of the report, shared by every request for the same mission and format
+    mission_id: int
+    format: str
+    status: str = "queued" # queued | running | completed | failed
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    completed_at: datetime | None = None
+    error: str | None = None
+
 class UserPreferences(BaseModel):
     theme: str = "dark"
     map_style: str = "satellite"
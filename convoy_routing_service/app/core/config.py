@@ -7,6 +7,31 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 7
+    # Mission reports (Block 7)
+    report_cache_dir: str = "reports_cache"
+    report_worker_threads: int = 2
+    report_job_stale_seconds: float = 1800.0 # Unfinished jobs owned by another host count as failed after this
+    # Risk model registry (Block 8)
+    model_registry_dir: str = "models/registry"
+    model_poll_seconds: float = 30.0
+    # Periodic network-wide risk rescoring (Block 8)
+    risk_rescore_interval_minutes: int = 15
+    risk_rescore_chunk_size: int = 2000
+    threat_decay_half_life_hours: float = 12.0
+    threat_lookback_hours: float = 96.0
+    # Shared road graph snapshot (Block 4)
+    graph_snapshot_path: str = "models/road_graph.snapshot"
+    risk_overlay_refresh_seconds: float = 300.0 # Full re-read of risk scores; the risk feed applies changes in between
+    # Corridor routing over spatial tiles (Block 4)
+    tile_size_degrees: float = 0.25
+    tile_cache_max_bytes: int = 256 * 1024 * 1024
+    tile_corridor_margin: int = 1
+    tile_max_corridor_margin: int = 8
+    # Risk change feed (Block 5)
+    risk_feed_poll_seconds: float = 1.0
+    # Alert coalescing (Block 3)
+    alert_suppression_minutes: int = 30
+    alert_count_resync_seconds: float = 60.0
 
     class Config:
         env_file = ".env"
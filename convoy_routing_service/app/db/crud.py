@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import and_, func
 from geoalchemy2.functions import ST_DWithin, ST_Distance, ST_Length
 from geoalchemy2.types import Geography
 from ..api import schemas  # <-- CORRECTED IMPORT (was 'from . import models, schemas')
@@ -64,17 +64,106 @@ def update_segment_risk(db: Session, segment_id: int, category: str, score: floa
     )
     db.commit()
 
-def get_features_for_segment(db: Session, segment_id: int) -> dict | None:
-    segment = db.query(models.RoadSegment).filter(models.RoadSegment.id == segment_id).first()
-    if not segment:
-        return None
-    # In a real system, this would calculate dynamic features
-    return {
-        "terrain": segment.terrain_type,
-        "road_class": segment.road_classification,
-        "elevation": segment.elevation,
-        "threats_within_2km_last_24h": 0, # Placeholder
-    }
+def bulk_update_segment_risk(db: Session, updates: list[dict]):
+    # updates: [{"id": ..., "risk_category": ..., "danger_score": ...}], written in one transaction
+    if not updates:
+        return
+    db.bulk_update_mappings(models.RoadSegment, updates)
+    db.commit()
+
+def get_segment_scoring_chunk(db: Session, after_id: int, limit: int):
+    """Keyset-paginated batch of segment attributes, current risk and centroid (lon, lat)."""
+    centroid = func.ST_Centroid(models.RoadSegment.geometry)
+    return db.query(
+        models.RoadSegment.id,
+        models.RoadSegment.terrain_type,
+        models.RoadSegment.road_classification,
+        models.RoadSegment.elevation,
+        models.RoadSegment.danger_score,
+        models.RoadSegment.risk_category,
+        func.ST_X(centroid).label("lon"),
+        func.ST_Y(centroid).label("lat"),
+    ).filter(models.RoadSegment.id > after_id).order_by(models.RoadSegment.id).limit(limit).all()
+
+def get_segment_centroids(db: Session, segment_ids) -> dict[int, tuple[float, float]]:
+    if not segment_ids:
+        return {}
+    centroid = func.ST_Centroid(models.RoadSegment.geometry)
+    rows = db.query(models.RoadSegment.id, func.ST_X(centroid), func.ST_Y(centroid)).filter(
+        models.RoadSegment.id.in_(segment_ids)
+    ).all()
+    return {row[0]: (row[1], row[2]) for row in rows}
+
+def get_recent_threat_points(db: Session, since):
+    return db.query(
+        func.ST_X(models.ThreatIncident.location).label("lon"),
+        func.ST_Y(models.ThreatIncident.location).label("lat"),
+        models.ThreatIncident.timestamp,
+    ).filter(
+        models.ThreatIncident.timestamp >= since,
+        models.ThreatIncident.verified_status != models.VerificationStatus.FALSE_POSITIVE,
+    ).all()
+
+def get_segment_static_features(db: Session):
+    # Column-only load; the geometry is reduced to its centroid (lon, lat) in the database
+    centroid = func.ST_Centroid(models.RoadSegment.geometry)
+    return db.query(models.RoadSegment.id, models.RoadSegment.terrain_type,
+                    models.RoadSegment.road_classification, models.RoadSegment.elevation,
+                    func.ST_X(centroid).label("lon"), func.ST_Y(centroid).label("lat")).all()
+
+def get_segment_threat_counts(db: Session, radius_meters: int, since=None) -> dict[int, int]:
+    """Counts non-false-positive threats within `radius_meters` of every segment, optionally since a time."""
+    join_condition = and_(
+        ST_DWithin(models.RoadSegment.geometry.cast(Geography), models.ThreatIncident.location.cast(Geography), radius_meters),
+        models.ThreatIncident.verified_status != models.VerificationStatus.FALSE_POSITIVE,
+    )
+    if since is not None:
+        join_condition = and_(join_condition, models.ThreatIncident.timestamp >= since)
+    rows = db.query(models.RoadSegment.id, func.count(models.ThreatIncident.id)).outerjoin(
+        models.ThreatIncident, join_condition
+    ).group_by(models.RoadSegment.id).all()
+    return dict(rows)
+
+def get_segment_endpoints(db: Session, tile_ids: list[int] | None = None):
+    """
+    (id, start_lon, start_lat, end_lon, end_lat, length, danger_score) for every segment, ordered by id.
+    When `tile_ids` is given only segments in those tiles are returned, with their tile_id appended.
+    """
+    geometry = models.RoadSegment.geometry
+    columns = [
+        models.RoadSegment.id,
+        func.ST_X(func.ST_StartPoint(geometry)),
+        func.ST_Y(func.ST_StartPoint(geometry)),
+        func.ST_X(func.ST_EndPoint(geometry)),
+        func.ST_Y(func.ST_EndPoint(geometry)),
+        models.RoadSegment.length,
+        models.RoadSegment.danger_score,
+    ]
+    if tile_ids is None:
+        return db.query(*columns).order_by(models.RoadSegment.id).all()
+    return db.query(*columns, models.RoadSegment.tile_id).filter(
+        models.RoadSegment.tile_id.in_(tile_ids)
+    ).order_by(models.RoadSegment.id).all()
+
+def get_segment_risk_scores(db: Session, tile_ids: list[int] | None = None):
+    """(id, danger_score) ordered by id; restricted to `tile_ids` with tile_id appended when given."""
+    if tile_ids is None:
+        return db.query(models.RoadSegment.id, models.RoadSegment.danger_score).order_by(models.RoadSegment.id).all()
+    return db.query(models.RoadSegment.id, models.RoadSegment.danger_score, models.RoadSegment.tile_id).filter(
+        models.RoadSegment.tile_id.in_(tile_ids)
+    ).order_by(models.RoadSegment.id).all()
+
+def assign_segment_tiles(db: Session, tile_size_degrees: float, tile_columns: int, only_missing: bool = False) -> int:
+    """Sets tile_id from each segment's centroid on the lon/lat tile grid. Returns the number of rows updated."""
+    centroid = func.ST_Centroid(models.RoadSegment.geometry)
+    tile_x = func.floor((func.ST_X(centroid) + 180) / tile_size_degrees)
+    tile_y = func.floor((func.ST_Y(centroid) + 90) / tile_size_degrees)
+    query = db.query(models.RoadSegment)
+    if only_missing:
+        query = query.filter(models.RoadSegment.tile_id.is_(None))
+    updated = query.update({models.RoadSegment.tile_id: tile_y * tile_columns + tile_x}, synchronize_session=False)
+    db.commit()
+    return updated
 
 def get_all_road_segments(db: Session):
     return db.query(models.RoadSegment).all()
@@ -97,6 +186,26 @@ def create_alert(db: Session, segment_id: int, severity: models.AlertSeverity, m
     db.refresh(db_alert)
     return db_alert
 
+def write_alert_batch(db: Session, new_alerts: list[dict], escalations: list[dict]):
+    # Inserts and escalations land in a single commit
+    if not new_alerts and not escalations:
+        return
+    if new_alerts:
+        db.bulk_insert_mappings(models.Alert, new_alerts)
+    if escalations:
+        db.bulk_update_mappings(models.Alert, escalations)
+    db.commit()
+
+def get_active_alerts_for_segments(db: Session, segment_ids, since):
+    return db.query(models.Alert).filter(
+        models.Alert.segment_id.in_(segment_ids),
+        models.Alert.status == models.AlertStatus.ACTIVE,
+        models.Alert.timestamp >= since,
+    ).all()
+
+def get_alert(db: Session, alert_id: int):
+    return db.query(models.Alert).filter(models.Alert.id == alert_id).first()
+
 def get_alerts_by_status(db: Session, status: models.AlertStatus):
     return db.query(models.Alert).filter(models.Alert.status == status).all()
 
@@ -129,6 +238,13 @@ def get_all_completed_missions(db: Session):
 def get_completed_mission(db: Session, mission_id: int):
     return db.query(models.CompletedMission).filter(models.CompletedMission.id == mission_id).first()
 
+def iter_completed_missions(db: Session, mission_ids: list[int] | None = None, batch_size: int = 100):
+    # Streams missions in id order without materialising the whole table
+    query = db.query(models.CompletedMission).order_by(models.CompletedMission.id)
+    if mission_ids:
+        query = query.filter(models.CompletedMission.id.in_(mission_ids))
+    return query.yield_per(batch_size)
+
 # Geospatial Helper Functions
 def calculate_distance(db: Session, geom1, geom2):
     return db.query(ST_Distance(geom1.cast(Geography), geom2.cast(Geography))).scalar()
@@ -136,4 +252,22 @@ def calculate_distance(db: Session, geom1, geom2):
 def generate_threat_density_grid(db: Session):
     # Placeholder for a more complex geospatial aggregation query
     threats = db.query(models.ThreatIncident.location).filter(models.ThreatIncident.verified_status == 'confirmed').all()
-    return [[threat.location.y, threat.location.x, 1] for threat in threats]
\ No newline at end of file
+    return [[threat.location.y, threat.location.x, 1] for threat in threats]
+
+def write_risk_changes(db: Session, changes: list[dict]):
+    # changes: [{"segment_id", "danger_score", "risk_category", "lon", "lat"}], one commit
+    if not changes:
+        return
+    db.bulk_insert_mappings(models.RiskChange, changes)
+    db.commit()
+
+def get_risk_changes_after(db: Session, after_id: int, limit: int):
+    return db.query(models.RiskChange).filter(models.RiskChange.id > after_id).order_by(
+        models.RiskChange.id).limit(limit).all()
+
+def get_latest_risk_change_id(db: Session) -> int:
+    return db.query(func.max(models.RiskChange.id)).scalar() or 0
+
+def delete_risk_changes_through(db: Session, max_id: int):
+    db.query(models.RiskChange).filter(models.RiskChange.id <= max_id).delete(synchronize_session=False)
+    db.commit()
@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+from collections.abc import Iterable
+from contextlib import contextmanager
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from ..core.config import settings
@@ -14,4 +16,77 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+@contextmanager
+def advisory_lock(name: str):
+    """
+    Holds a MySQL named lock on a dedicated connection for the duration of the block.
+    Yields whether it was acquired; does not wait if another process holds it.
+    """
+    with advisory_locks([name]) as acquired:
+        yield acquired
+
+@contextmanager
+def advisory_locks(names: Iterable[str], timeout: float = 0):
+    """
+    Holds several MySQL named locks on one dedicated connection for the duration of the block,
+    waiting up to `timeout` seconds for each. Locks are taken in sorted order so two callers
+    never deadlock. Yields whether all were acquired; none are held otherwise.
+    """
+    wanted = sorted(set(names))
+    with engine.connect() as conn:
+        held = []
+        try:
+            for name in wanted:
+                if conn.execute(text("SELECT GET_LOCK(:name, :timeout)"), {"name": name, "timeout": timeout}).scalar() != 1:
+                    break
+                held.append(name)
+            acquired = len(held) == len(wanted)
+            if not acquired:
+                _release_all(conn, held) # Don't block others while the caller carries on without them
+                held.clear()
+            yield acquired
+        finally:
+            _release_all(conn, held)
+
+def _release_all(conn, names: list[str]):
+    for name in names:
+        conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
+
+class HeldLock:
+    """
+    MySQL named lock kept on its own connection until released, so that exactly one worker
+    process at a time owns a role. If the owner dies its connection drops and another can take over.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._conn = None
+
+    def try_hold(self) -> bool:
+        """Whether this process holds the lock, taking it first if it is free."""
+        try:
+            if self._conn is None:
+                conn = engine.connect()
+                if conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": self.name}).scalar() != 1:
+                    conn.close()
+                    return False
+                self._conn = conn
+                return True
+            # Still ours? The lock is lost if the server dropped the connection
+            return self._conn.execute(text("SELECT IS_USED_LOCK(:name) = CONNECTION_ID()"),
+                                      {"name": self.name}).scalar() == 1
+        except Exception as e:
+            print(f"Lock '{self.name}' check failed: {e}")
+            self.release()
+            return False
+
+    def release(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": self.name})
+        except Exception:
+            pass # Connection already gone; the server released the lock with it
+        finally:
+            self._conn.close()
+            self._conn = None
@@ -29,6 +29,18 @@ class RoadSegment(Base):
     elevation = Column(Float)
     danger_score = Column(Float, default=0.0) # Continuous score
     risk_category = Column(String(50), default="Low") # Categorical risk
+    tile_id = Column(Integer, index=True) # Spatial tile of the segment centroid, see services/graph_tiles.py
+
+# Risk change log read by every worker's risk feed; the id is the feed version
+class RiskChange(Base):
+    __tablename__ = 'risk_changes'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    segment_id = Column(Integer, nullable=False)
+    danger_score = Column(Float, nullable=False)
+    risk_category = Column(String(50), nullable=False)
+    lon = Column(Float)
+    lat = Column(Float)
+    timestamp = Column(DateTime, default=datetime.datetime.utcnow)
 
 # Block 6: Enhanced Threat Model
 class ThreatClassification(str, enum.Enum):
@@ -1,15 +1,34 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware # 1. Import the middleware
+from fastapi.responses import JSONResponse
 from .db.database import engine, Base
 from .api import endpoints
+from .services import report_jobs, risk_feed, risk_rescoring, route_optimizer, simulation_service, warmup
 
-# Create all database tables based on the models
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create all database tables based on the models
+    Base.metadata.create_all(bind=engine)
+    simulation_service.start_scheduler()
+    risk_rescoring.schedule_rescoring(simulation_service.scheduler)
+    if not route_optimizer.load_graph_snapshot():
+        print("No road graph snapshot found; workers will route over corridor tiles from the database.")
+    risk_feed.risk_feed.start()
+    # Warm the graph, model and caches off the event loop; /ready reports when it is done
+    warmup.start_warmup()
+    yield
+    simulation_service.shutdown_scheduler()
+    risk_feed.risk_feed.stop()
+    risk_rescoring.release_rescoring_schedule()
+    report_jobs.report_job_manager.shutdown()
 
 app = FastAPI(
     title="AI-Powered Defense Convoy Routing System",
     description="A comprehensive backend for dynamic, secure, and intelligent convoy mission planning and monitoring.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # 2. Add the CORS middleware to the app
@@ -36,4 +55,9 @@ app.include_router(endpoints.router)
 
 @app.get("/", tags=["Root"])
 def read_root():
-    return {"message": "Convoy Routing System API is online."}
\ No newline at end of file
+    return {"message": "Convoy Routing System API is online."}
+
+@app.get("/ready", tags=["Root"])
+def read_readiness():
+    state = warmup.warmup_state.snapshot()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=jsonable_encoder(state))
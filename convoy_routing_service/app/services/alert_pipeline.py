@@ -0,0 +1,100 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..db import crud, database, models
+
+SEVERITY_RANK = {models.AlertSeverity.HIGH: 1, models.AlertSeverity.CRITICAL: 2}
+SEGMENT_LOCK_STRIPES = 64 # Named locks segments hash onto; batches touching disjoint stripes run concurrently
+SEGMENT_LOCK_TIMEOUT_SECONDS = 10
+
+class AlertCandidate(NamedTuple):
+    segment_id: int
+    severity: models.AlertSeverity
+    message: str
+
+class AlertPipeline:
+    """
+    Coalesces alerts per segment: within the suppression window a segment keeps one
+    active alert, which is escalated in place when a more severe candidate arrives and
+    left alone otherwise. Workers serialise the read-then-write per segment with MySQL named
+    locks, so concurrent threats cannot both insert an alert for the same segment. Also keeps this worker's count of active alerts in memory,
+    re-seeded from the database periodically to pick up other workers' writes.
+    """
+    def __init__(self, suppression_minutes: int, resync_seconds: float):
+        self.suppression_window = timedelta(minutes=suppression_minutes)
+        self.resync_seconds = resync_seconds
+        self._active_count: int | None = None
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def submit(self, db: Session, candidates: list[AlertCandidate], now: datetime | None = None) -> dict:
+        """Writes a batch of candidates in one transaction. Returns counts of what happened."""
+        now = now or datetime.utcnow()
+        # Strongest candidate per segment within the batch
+        strongest: dict[int, AlertCandidate] = {}
+        for candidate in candidates:
+            current = strongest.get(candidate.segment_id)
+            if current is None or SEVERITY_RANK[candidate.severity] > SEVERITY_RANK[current.severity]:
+                strongest[candidate.segment_id] = candidate
+        if not strongest:
+            return {"inserted": 0, "escalated": 0, "suppressed": 0}
+
+        lock_names = {f"alert_segment_{segment_id % SEGMENT_LOCK_STRIPES}" for segment_id in strongest}
+        with database.advisory_locks(lock_names, timeout=SEGMENT_LOCK_TIMEOUT_SECONDS) as acquired:
+            if not acquired:
+                # A duplicate alert is better than a lost one
+                print("Alert segment locks timed out; writing alerts unserialised.")
+            existing: dict[int, models.Alert] = {}
+            for alert in crud.get_active_alerts_for_segments(db, list(strongest), now - self.suppression_window):
+                kept = existing.get(alert.segment_id)
+                if kept is None or SEVERITY_RANK[alert.severity] > SEVERITY_RANK[kept.severity]:
+                    existing[alert.segment_id] = alert
+
+            new_alerts, escalations = [], []
+            for segment_id, candidate in strongest.items():
+                alert = existing.get(segment_id)
+                if alert is None:
+                    new_alerts.append({"segment_id": segment_id, "severity": candidate.severity, "message": candidate.message,
+                                       "timestamp": now, "status": models.AlertStatus.ACTIVE})
+                elif SEVERITY_RANK[candidate.severity] > SEVERITY_RANK[alert.severity]:
+                    escalations.append({"id": alert.id, "severity": candidate.severity, "message": candidate.message,
+                                        "timestamp": now})
+            crud.write_alert_batch(db, new_alerts, escalations) # Commits before the locks are released
+
+        with self._lock:
+            if self._active_count is not None:
+                self._active_count += len(new_alerts)
+        return {"inserted": len(new_alerts), "escalated": len(escalations),
+                "suppressed": len(strongest) - len(new_alerts) - len(escalations)}
+
+    def active_count(self, db: Session) -> int:
+        """Active alert count, hitting the database only to (re)seed the counter."""
+        if self._active_count is None or time.monotonic() - self._synced_at >= self.resync_seconds:
+            count = crud.get_alert_count(db, models.AlertStatus.ACTIVE)
+            with self._lock:
+                self._active_count = count
+                self._synced_at = time.monotonic()
+        return self._active_count
+
+    def acknowledge(self, db: Session, alert_id: int):
+        alert = crud.get_alert(db, alert_id)
+        if not alert:
+            return None
+        was_active = alert.status == models.AlertStatus.ACTIVE
+        alert = crud.update_alert_status(db, alert_id, models.AlertStatus.ACKNOWLEDGED)
+        if was_active:
+            with self._lock:
+                if self._active_count is not None:
+                    self._active_count = max(0, self._active_count - 1)
+        return alert
+
+    def reset(self):
+        """Call after the alerts table has been cleared."""
+        with self._lock:
+            self._active_count = 0
+            self._synced_at = time.monotonic()
+
+alert_pipeline = AlertPipeline(settings.alert_suppression_minutes, settings.alert_count_resync_seconds)
@@ -0,0 +1,72 @@
+import math
+from typing import NamedTuple
+import numpy as np
+from .graph_snapshot import RoadGraph
+
+class CostMatrix(NamedTuple):
+    cost: list[list[float | None]] # length + danger_score * risk_weight, None if unreachable
+    distance: list[list[float | None]] # meters along the least-cost path
+    risk: list[list[float | None]] # cumulative danger_score along the least-cost path
+
+def metric_weights(metric: str, risk_weight: float) -> tuple[float, float]:
+    """(distance_weight, risk_weight) for a reachability budget metric; "cost" uses the mode's weight."""
+    if metric == "distance":
+        return 1.0, 0.0
+    if metric == "risk":
+        return 0.0, 1.0
+    return 1.0, risk_weight
+
+def compute_cost_matrix(graph: RoadGraph, source_nodes: list[int], target_nodes: list[int],
+                        risk_weight: float) -> CostMatrix:
+    """One shortest-path tree per source, stopped once every target is settled."""
+    cost_rows, distance_rows, risk_rows = [], [], []
+    unique_targets = set(target_nodes)
+    for source in source_nodes:
+        tree = graph.dijkstra(source, distance_weight=1.0, risk_weight=risk_weight, targets=unique_targets)
+        # Totals per tree node are memoised so shared prefixes are walked once
+        totals: dict[int, tuple[float, float]] = {source: (0.0, 0.0)}
+        cost_row, distance_row, risk_row = [], [], []
+        for target in target_nodes:
+            if not tree.settled[target]:
+                cost_row.append(None)
+                distance_row.append(None)
+                risk_row.append(None)
+                continue
+            distance, risk = _path_totals(graph, tree, target, totals)
+            cost_row.append(float(tree.cost[target]))
+            distance_row.append(distance)
+            risk_row.append(risk)
+        cost_rows.append(cost_row)
+        distance_rows.append(distance_row)
+        risk_rows.append(risk_row)
+    return CostMatrix(cost_rows, distance_rows, risk_rows)
+
+def _path_totals(graph: RoadGraph, tree, node: int, totals: dict) -> tuple[float, float]:
+    chain = []
+    while node not in totals:
+        chain.append(node)
+        node = int(tree.parent_node[node])
+    distance, risk = totals[node]
+    for node in reversed(chain):
+        seg = tree.parent_segment[node]
+        distance += float(graph.segment_distance[seg])
+        risk += float(graph.risk[seg])
+        totals[node] = (distance, risk)
+    return distance, risk
+
+def reachable_segments(graph: RoadGraph, source_nodes: list[int], budget: float,
+                       distance_weight: float, risk_weight: float) -> tuple[list[int], list[float]]:
+    """
+    Segments that can be fully traversed from the nearest source within `budget`, from a
+    single multi-source tree. Returns (segment ids, cost at the far end of each segment).
+    """
+    tree = graph.dijkstra(source_nodes, distance_weight=distance_weight, risk_weight=risk_weight, budget=budget)
+    best = np.full(graph.segment_count, math.inf)
+    for node in np.flatnonzero(tree.settled).tolist():
+        lo, hi = graph.indptr[node], graph.indptr[node + 1]
+        segments = graph.edge_segment[lo:hi]
+        far_cost = tree.cost[node] + graph.segment_distance[segments] * distance_weight + graph.risk[segments] * risk_weight
+        # A segment is reached from whichever end gets across it more cheaply
+        np.minimum.at(best, segments, far_cost)
+    reached = np.flatnonzero(best <= budget)
+    return graph.segment_ids[reached].tolist(), best[reached].tolist()
@@ -1,6 +1,11 @@
+from datetime import datetime
 from sqlalchemy.orm import Session
 from ..db import crud
 from . import ml_engine, convoy_manager, route_optimizer
+from .alert_pipeline import AlertCandidate, alert_pipeline
+from .risk_feed import risk_feed
+from .risk_rescoring import SCORE_EPSILON
+from .threat_features import segment_feature_row, segment_threat_influence
 
 HIGH_THRESHOLD = 0.75
 CRITICAL_THRESHOLD = 0.90
@@ -15,18 +20,36 @@ def handle_new_threat(db: Session, threat_id: int):
 
     # 1. Find and update risk for nearby road segments
     affected_segments = crud.get_segments_near_point(db, threat.location.wkt, 15000) # 15km radius
-    for segment in affected_segments:
-        features = crud.get_features_for_segment(db, segment.id)
-        category, score = ml_engine.predict_segment_risk(features)
-        crud.update_segment_risk(db, segment.id, category, score)
-        
-        # 2. Trigger new alerts if thresholds are crossed
+    # Read before the bulk write: its commit expires the ORM rows, which would then reload the new values
+    previous = {segment.id: (segment.risk_category, segment.danger_score or 0.0) for segment in affected_segments}
+    # Same threat feature as training and rescoring, so a new threat adds to the decayed history
+    centroids = crud.get_segment_centroids(db, [segment.id for segment in affected_segments])
+    scored_segments = [segment for segment in affected_segments if segment.id in centroids]
+    now = max(datetime.utcnow(), threat.timestamp) # DATETIME rounding can put the stored time ahead of the clock
+    influence = segment_threat_influence(db, [centroids[segment.id][0] for segment in scored_segments],
+                                         [centroids[segment.id][1] for segment in scored_segments], now)
+    categories, scores = ml_engine.predict_segment_risk_batch(
+        [segment_feature_row(segment, influence[i]) for i, segment in enumerate(scored_segments)])
+    risk_updates = []
+    alert_candidates = []
+    for segment, category, score in zip(scored_segments, categories, scores):
+        score = round(float(score), 4)
+        risk_updates.append({"id": segment.id, "risk_category": category, "danger_score": score})
+
+        # 2. Queue alerts if thresholds are crossed; the pipeline coalesces repeats per segment
         if score >= CRITICAL_THRESHOLD:
-            crud.create_alert(db, segment.id, crud.models.AlertSeverity.CRITICAL,
-                              f"CRITICAL risk ({score:.2f}) on segment {segment.id} due to new threat.")
+            alert_candidates.append(AlertCandidate(segment.id, crud.models.AlertSeverity.CRITICAL,
+                                                   f"CRITICAL risk ({score:.2f}) on segment {segment.id} due to new threat."))
         elif score >= HIGH_THRESHOLD:
-            crud.create_alert(db, segment.id, crud.models.AlertSeverity.HIGH,
-                              f"HIGH risk ({score:.2f}) on segment {segment.id} due to new threat.")
+            alert_candidates.append(AlertCandidate(segment.id, crud.models.AlertSeverity.HIGH,
+                                                   f"HIGH risk ({score:.2f}) on segment {segment.id} due to new threat."))
+    crud.bulk_update_segment_risk(db, risk_updates)
+    route_optimizer.apply_risk_changes(risk_updates)
+    changed = [update for update in risk_updates
+               if update["risk_category"] != previous[update["id"]][0]
+               or abs(update["danger_score"] - previous[update["id"]][1]) >= SCORE_EPSILON]
+    risk_feed.publish(db, changed, {update["id"]: centroids[update["id"]] for update in changed})
+    alert_pipeline.submit(db, alert_candidates)
 
     # 3. Check for affected active convoys and re-route them
     active_convoys = convoy_manager.get_all_active_convoys()
@@ -37,12 +60,9 @@ def handle_new_threat(db: Session, threat_id: int):
             print(f"Re-routing convoy {convoy.call_sign} due to new threat...")
             # Placeholder for D* Lite re-routing logic
             # For now, we'll re-calculate with A* from the current location
-            graph = route_optimizer.build_weighted_graph(db, "balance")
-            start_node = route_optimizer.find_nearest_node(graph, convoy.current_location)
-            end_node = route_optimizer.find_nearest_node(graph, convoy.destination)
-            new_path_nodes = route_optimizer.find_astar_path(graph, start_node, end_node)
+            graph, new_path = route_optimizer.plan_route(db, convoy.current_location, convoy.destination, "balance")
             
-            if new_path_nodes:
-                new_segment_ids = route_optimizer.get_path_segment_ids(graph, new_path_nodes)
+            if new_path:
+                new_segment_ids = graph.path_segment_ids(new_path)
                 convoy_manager.update_convoy(convoy.id, {"status": "Re-routing", "current_path": new_segment_ids})
                 # In a real app, a WebSocket push notification would be sent here.
\ No newline at end of file
@@ -0,0 +1,273 @@
+"""
+Compact CSR representation of the road network and its on-disk snapshot format.
+
+A snapshot is a single file: an 8-byte magic, a little-endian uint32 format
+version and uint32 header length, a JSON header describing each array
+(dtype, shape, byte offset), then the raw arrays at 64-byte aligned offsets.
+Workers memory-map it read-only, so the topology is shared through the OS page
+cache; only the risk overlay is a private, writable copy per worker.
+"""
+import heapq
+import json
+import math
+import os
+import struct
+import uuid
+from typing import NamedTuple
+import numpy as np
+
+MAGIC = b"TRNGRAPH"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+EARTH_RADIUS_METERS = 6_371_000.0
+# Segment lengths are measured along the road, so great-circle distance never
+# overestimates; the slack only absorbs rounding in stored lengths.
+HEURISTIC_SLACK = 0.999
+
+_PREAMBLE = struct.Struct("<8sII")
+
+class GraphPath(NamedTuple):
+    nodes: list[int] # Node indices, start to end
+    segments: list[int] # Segment indices (not DB ids), one per hop
+
+class ShortestPathTree(NamedTuple):
+    cost: np.ndarray
+    parent_node: np.ndarray
+    parent_segment: np.ndarray
+    settled: np.ndarray # Nodes whose cost is final
+
+class RoadGraph:
+    """
+    Undirected road graph in CSR form.
+
+    node_coords[n] is (lon, lat); the neighbours of node n are
+    indices[indptr[n]:indptr[n+1]], reached over segment edge_segment[slot].
+    Segment arrays are indexed by position and sorted by DB id.
+    """
+    ARRAYS = ("node_coords", "indptr", "indices", "edge_segment", "segment_ids", "segment_distance", "segment_risk")
+
+    def __init__(self, node_coords, indptr, indices, edge_segment, segment_ids, segment_distance, segment_risk):
+        self.node_coords = node_coords
+        self.indptr = indptr
+        self.indices = indices
+        self.edge_segment = edge_segment
+        self.segment_ids = segment_ids
+        self.segment_distance = segment_distance
+        self.segment_risk = segment_risk # Baseline risk as exported
+        self.risk = np.array(segment_risk, dtype=np.float64) # Per-worker overlay
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_coords)
+
+    @property
+    def segment_count(self) -> int:
+        return len(self.segment_ids)
+
+    @classmethod
+    def from_segment_rows(cls, rows) -> "RoadGraph":
+        """Builds a graph from (id, start_lon, start_lat, end_lon, end_lat, length, danger_score) rows."""
+        rows = list(rows)
+        return cls.from_arrays(
+            np.array([row[0] for row in rows], dtype=np.int64),
+            np.array([row[1:5] for row in rows], dtype=np.float64).reshape(-1, 4),
+            np.array([row[5] for row in rows], dtype=np.float64),
+            np.array([row[6] or 0.0 for row in rows], dtype=np.float64),
+        )
+
+    @classmethod
+    def from_arrays(cls, segment_ids, endpoints, lengths, risks) -> "RoadGraph":
+        """Builds a graph from per-segment arrays; endpoints is (S, 4) of start lon/lat, end lon/lat."""
+        order = np.argsort(segment_ids, kind="stable")
+        segment_ids, endpoints = segment_ids[order], endpoints[order]
+        segment_distance, segment_risk = lengths[order], risks[order]
+
+        # Segments sharing an exact endpoint coordinate share a node
+        node_coords, inverse = np.unique(endpoints.reshape(-1, 2), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        edge_u, edge_v = inverse[0::2].astype(np.int32), inverse[1::2].astype(np.int32)
+
+        # Each undirected segment becomes two directed CSR slots
+        seg_index = np.arange(len(segment_ids), dtype=np.int32)
+        src = np.concatenate([edge_u, edge_v])
+        dst = np.concatenate([edge_v, edge_u])
+        seg = np.concatenate([seg_index, seg_index])
+        order = np.argsort(src, kind="stable")
+        indptr = np.zeros(len(node_coords) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(node_coords)), out=indptr[1:])
+        return cls(node_coords.reshape(-1, 2), indptr, dst[order].astype(np.int32), seg[order].astype(np.int32),
+                   segment_ids, segment_distance, segment_risk)
+
+    # --- Risk overlay ---
+    def segment_positions(self, segment_ids) -> tuple[np.ndarray, np.ndarray]:
+        """Maps DB ids to segment positions. Returns (positions, mask of ids present in this graph)."""
+        ids = np.asarray(segment_ids, dtype=np.int64)
+        positions = np.searchsorted(self.segment_ids, ids)
+        positions = np.minimum(positions, max(self.segment_count - 1, 0))
+        found = self.segment_ids[positions] == ids if self.segment_count else np.zeros(len(ids), dtype=bool)
+        return positions, found
+
+    def update_risk(self, segment_ids, scores):
+        positions, found = self.segment_positions(segment_ids)
+        self.risk[positions[found]] = np.asarray(scores, dtype=np.float64)[found]
+
+    # --- Queries ---
+    def nearest_node(self, lon: float, lat: float) -> int:
+        deltas = self.node_coords - np.array([lon, lat])
+        return int(np.argmin(np.einsum("ij,ij->i", deltas, deltas)))
+
+    def _distance_to(self, nodes, lon: float, lat: float) -> np.ndarray:
+        coords = np.radians(self.node_coords[nodes])
+        lat0, lon0 = math.radians(lat), math.radians(lon)
+        a = (np.sin((coords[:, 1] - lat0) / 2) ** 2
+             + np.cos(coords[:, 1]) * math.cos(lat0) * np.sin((coords[:, 0] - lon0) / 2) ** 2)
+        return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    def astar(self, start: int, goal: int, risk_weight: float) -> GraphPath | None:
+        """A* over cost = length + danger_score * risk_weight with a great-circle heuristic."""
+        goal_lon, goal_lat = self.node_coords[goal]
+        best = {start: 0.0}
+        parent: dict[int, tuple[int, int]] = {}
+        closed = set()
+        heap = [(0.0, 0.0, start)]
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == goal:
+                return self._reconstruct(parent, start, goal)
+            if node in closed:
+                continue
+            closed.add(node)
+            lo, hi = self.indptr[node], self.indptr[node + 1]
+            if lo == hi:
+                continue
+            neighbours = self.indices[lo:hi]
+            segments = self.edge_segment[lo:hi]
+            new_costs = cost + self.segment_distance[segments] + self.risk[segments] * risk_weight
+            estimates = new_costs + self._distance_to(neighbours, goal_lon, goal_lat) * HEURISTIC_SLACK
+            for nbr, seg, new_cost, estimate in zip(neighbours.tolist(), segments.tolist(),
+                                                    new_costs.tolist(), estimates.tolist()):
+                if new_cost < best.get(nbr, math.inf):
+                    best[nbr] = new_cost
+                    parent[nbr] = (node, seg)
+                    heapq.heappush(heap, (estimate, new_cost, nbr))
+        return None
+
+    def dijkstra(self, sources, distance_weight: float = 1.0, risk_weight: float = 0.0,
+                 budget: float = math.inf, targets=None, allowed: np.ndarray | None = None) -> "ShortestPathTree":
+        """
+        Shortest-path tree over cost = length * distance_weight + danger_score * risk_weight,
+        grown from one node or several at once (each at cost 0). Stops at `budget` or once every
+        node in `targets` is settled; costs of nodes left unsettled by an early stop are only
+        upper bounds. With an `allowed` node mask the tree never leaves those nodes.
+        Unreached nodes have infinite cost and parent -1.
+        """
+        sources = [sources] if isinstance(sources, (int, np.integer)) else list(sources)
+        cost = np.full(self.node_count, math.inf)
+        parent_node = np.full(self.node_count, -1, dtype=np.int64)
+        parent_segment = np.full(self.node_count, -1, dtype=np.int64)
+        cost[sources] = 0.0
+        remaining = set(targets) if targets is not None else None
+        settled = np.zeros(self.node_count, dtype=bool)
+        heap = [(0.0, source) for source in sources]
+        heapq.heapify(heap)
+        while heap:
+            node_cost, node = heapq.heappop(heap)
+            if settled[node]:
+                continue
+            settled[node] = True
+            if remaining is not None:
+                remaining.discard(node)
+                if not remaining:
+                    break
+            lo, hi = self.indptr[node], self.indptr[node + 1]
+            if lo == hi:
+                continue
+            neighbours = self.indices[lo:hi]
+            segments = self.edge_segment[lo:hi]
+            new_costs = node_cost + self.segment_distance[segments] * distance_weight + self.risk[segments] * risk_weight
+            improved = (new_costs < cost[neighbours]) & (new_costs <= budget)
+            if allowed is not None:
+                improved &= allowed[neighbours]
+            for nbr, seg, new_cost in zip(neighbours[improved].tolist(), segments[improved].tolist(),
+                                          new_costs[improved].tolist()):
+                if new_cost < cost[nbr]: # Parallel segments may share a neighbour
+                    cost[nbr] = new_cost
+                    parent_node[nbr] = node
+                    parent_segment[nbr] = seg
+                    heapq.heappush(heap, (new_cost, nbr))
+        return ShortestPathTree(cost, parent_node, parent_segment, settled)
+
+    @staticmethod
+    def _reconstruct(parent, start: int, goal: int) -> GraphPath:
+        nodes, segments = [goal], []
+        while nodes[-1] != start:
+            prev, seg = parent[nodes[-1]]
+            nodes.append(prev)
+            segments.append(seg)
+        nodes.reverse()
+        segments.reverse()
+        return GraphPath(nodes, segments)
+
+    def node_coordinates(self, nodes) -> list[tuple[float, float]]:
+        return [tuple(coord) for coord in self.node_coords[nodes].tolist()]
+
+    def path_details(self, path: GraphPath) -> dict:
+        """{"segments": [...], "total_distance": meters}; segments match schemas.SegmentDetail."""
+        seg = np.asarray(path.segments, dtype=np.int64)
+        distances = self.segment_distance[seg]
+        segments = [
+            {"segment_id": seg_id, "distance_km": distance / 1000, "risk_score": risk}
+            for seg_id, distance, risk in zip(self.segment_ids[seg].tolist(), distances.tolist(), self.risk[seg].tolist())
+        ]
+        return {"segments": segments, "total_distance": float(distances.sum())}
+
+    def path_segment_ids(self, path: GraphPath) -> list[int]:
+        return self.segment_ids[np.asarray(path.segments, dtype=np.int64)].tolist()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS) + self.risk.nbytes
+
+# --- Snapshot I/O ---
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def write_snapshot(graph: RoadGraph, path: str):
+    """Writes `graph` to `path` atomically; workers holding the old file keep their mapping."""
+    arrays = {name: np.ascontiguousarray(getattr(graph, name)) for name in RoadGraph.ARRAYS}
+    # Offsets depend on the header size, so lay out relative to the data start first
+    layout, cursor = {}, 0
+    for name, array in arrays.items():
+        cursor = _aligned(cursor)
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": cursor}
+        cursor += array.nbytes
+    header = json.dumps({"arrays": layout}).encode()
+    data_start = _aligned(_PREAMBLE.size + len(header))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+def load_snapshot(path: str) -> RoadGraph:
+    """Memory-maps a snapshot read-only. Only the risk overlay is copied into private memory."""
+    buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    magic, version, header_len = _PREAMBLE.unpack(bytes(buffer[:_PREAMBLE.size]))
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"{path} is not a version {FORMAT_VERSION} road graph snapshot.")
+    header = json.loads(bytes(buffer[_PREAMBLE.size:_PREAMBLE.size + header_len]))
+    data_start = _aligned(_PREAMBLE.size + header_len)
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        start = data_start + spec["offset"]
+        arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+    return RoadGraph(**arrays)
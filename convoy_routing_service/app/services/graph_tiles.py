@@ -0,0 +1,177 @@
+"""
+Regional tiling of the road network.
+
+Every segment carries a precomputed tile id derived from its centroid on a
+fixed lon/lat grid. A route request loads only the tiles covering the corridor
+between its endpoints (widening until a path exists) into an LRU cache bounded
+by bytes, so routing memory no longer scales with the size of the whole network.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..db import crud
+from .graph_snapshot import RoadGraph
+
+TILE_COLUMNS = math.ceil(360 / settings.tile_size_degrees)
+METERS_PER_DEGREE = 111_320.0 # Of latitude; of longitude at the equator
+
+def tile_xy(lon: float, lat: float) -> tuple[int, int]:
+    size = settings.tile_size_degrees
+    return int((lon + 180) // size), int((lat + 90) // size)
+
+def tile_id(tile_x: int, tile_y: int) -> int:
+    return tile_y * TILE_COLUMNS + tile_x
+
+def tile_id_for_point(lon: float, lat: float) -> int:
+    return tile_id(*tile_xy(lon, lat))
+
+def corridor_tiles(points: list[tuple[float, float]], margin: int) -> list[int]:
+    """Tiles of the lon/lat box spanning all points, grown by `margin` tiles on each side."""
+    xs, ys = zip(*(tile_xy(*point) for point in points))
+    rows = range(max(min(ys) - margin, 0), max(ys) + margin + 1)
+    cols = range(min(xs) - margin, max(xs) + margin + 1)
+    return [tile_id(x % TILE_COLUMNS, y) for y in rows for x in cols]
+
+def margin_for_distance(points: list[tuple[float, float]], meters: float) -> int:
+    """Smallest corridor margin covering everything within `meters` of the points, capped at the maximum."""
+    max_lat = min(max(abs(lat) for _, lat in points) + settings.tile_size_degrees, 89.0)
+    tile_width = settings.tile_size_degrees * METERS_PER_DEGREE * math.cos(math.radians(max_lat))
+    return min(math.ceil(meters / tile_width), settings.tile_max_corridor_margin)
+
+class Tile:
+    def __init__(self, segment_ids: np.ndarray, endpoints: np.ndarray, lengths: np.ndarray, risks: np.ndarray):
+        self.segment_ids = segment_ids
+        self.endpoints = endpoints
+        self.lengths = lengths
+        self.risks = risks
+        self.risk_refreshed_at = time.monotonic()
+
+    @classmethod
+    def from_rows(cls, rows) -> "Tile":
+        return cls(
+            np.array([row[0] for row in rows], dtype=np.int64),
+            np.array([row[1:5] for row in rows], dtype=np.float64).reshape(-1, 4),
+            np.array([row[5] for row in rows], dtype=np.float64),
+            np.array([row[6] or 0.0 for row in rows], dtype=np.float64),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.segment_ids.nbytes + self.endpoints.nbytes + self.lengths.nbytes + self.risks.nbytes
+
+    def update_risk(self, segment_ids: np.ndarray, scores: np.ndarray):
+        """Applies scores for ids sorted ascending; ids outside this tile are ignored."""
+        if not len(self.segment_ids):
+            return
+        # Narrow to this tile's id range first, then locate each id (tile rows are sorted by id)
+        lo = np.searchsorted(segment_ids, self.segment_ids[0], side="left")
+        hi = np.searchsorted(segment_ids, self.segment_ids[-1], side="right")
+        ids, scores = segment_ids[lo:hi], scores[lo:hi]
+        positions = np.minimum(np.searchsorted(self.segment_ids, ids), len(self.segment_ids) - 1)
+        found = self.segment_ids[positions] == ids
+        self.risks[positions[found]] = scores[found]
+
+class TileCache:
+    """LRU of loaded tiles, evicting least recently used tiles once over `max_bytes`."""
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._tiles: OrderedDict[int, Tile] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    def get_many(self, db: Session, tile_ids: list[int]) -> list[Tile]:
+        with self._lock:
+            cached = {tid: self._tiles[tid] for tid in tile_ids if tid in self._tiles}
+            for tid in cached:
+                self._tiles.move_to_end(tid)
+        missing = [tid for tid in tile_ids if tid not in cached]
+        if missing:
+            loaded = self._load(db, missing)
+            with self._lock:
+                for tid, tile in loaded.items():
+                    if tid not in self._tiles:
+                        self._tiles[tid] = tile
+                        self._bytes += tile.nbytes
+                self._evict()
+            cached.update(loaded)
+
+        stale = [tid for tid, tile in cached.items()
+                 if time.monotonic() - tile.risk_refreshed_at >= settings.risk_overlay_refresh_seconds]
+        if stale:
+            self._refresh_risk(db, {tid: cached[tid] for tid in stale})
+        return [cached[tid] for tid in tile_ids]
+
+    def _load(self, db: Session, tile_ids: list[int]) -> dict[int, Tile]:
+        rows_by_tile: dict[int, list] = {tid: [] for tid in tile_ids} # Empty tiles are cached too
+        for row in crud.get_segment_endpoints(db, tile_ids=tile_ids):
+            rows_by_tile[row[-1]].append(row[:-1])
+        return {tid: Tile.from_rows(rows) for tid, rows in rows_by_tile.items()}
+
+    def _refresh_risk(self, db: Session, tiles: dict[int, Tile]):
+        rows = crud.get_segment_risk_scores(db, tile_ids=list(tiles))
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        scores = np.array([row[1] or 0.0 for row in rows], dtype=np.float64)
+        tile_of_row = np.array([row[2] for row in rows], dtype=np.int64)
+        for tid, tile in tiles.items():
+            in_tile = tile_of_row == tid
+            tile.update_risk(ids[in_tile], scores[in_tile])
+            tile.risk_refreshed_at = time.monotonic()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._tiles) > 1:
+            _, tile = self._tiles.popitem(last=False)
+            self._bytes -= tile.nbytes
+
+    def apply_risk_changes(self, changes: list[dict]):
+        if not changes:
+            return
+        ids = np.array([change["id"] for change in changes], dtype=np.int64)
+        scores = np.array([change["danger_score"] for change in changes], dtype=np.float64)
+        order = np.argsort(ids, kind="stable")
+        ids, scores = ids[order], scores[order]
+        with self._lock:
+            tiles = list(self._tiles.values())
+        for tile in tiles:
+            tile.update_risk(ids, scores)
+
+tile_cache = TileCache(settings.tile_cache_max_bytes)
+
+def build_tile_graph(tiles: list[Tile]) -> RoadGraph:
+    tiles = [tile for tile in tiles if len(tile.segment_ids)]
+    if not tiles:
+        return RoadGraph.from_segment_rows([])
+    return RoadGraph.from_arrays(
+        np.concatenate([tile.segment_ids for tile in tiles]),
+        np.concatenate([tile.endpoints for tile in tiles]),
+        np.concatenate([tile.lengths for tile in tiles]),
+        np.concatenate([tile.risks for tile in tiles]),
+    )
+
+def load_corridor_graph(db: Session, points: list[tuple[float, float]], margin: int) -> RoadGraph:
+    return build_tile_graph(tile_cache.get_many(db, corridor_tiles(points, margin)))
+
+def corridor_graphs(db: Session, points: list[tuple[float, float]], margin: int | None = None):
+    """
+    Yields subgraphs around the (lon, lat) points, doubling the corridor margin each time
+    until the maximum margin. With `margin` given, yields only that one subgraph.
+    """
+    if margin is not None:
+        yield load_corridor_graph(db, points, margin)
+        return
+    margin = settings.tile_corridor_margin
+    while True:
+        yield load_corridor_graph(db, points, margin)
+        if margin >= settings.tile_max_corridor_margin:
+            return
+        margin = min(max(margin * 2, 1), settings.tile_max_corridor_margin)
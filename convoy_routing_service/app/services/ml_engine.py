@@ -1,46 +1,174 @@
-import lightgbm as lgb
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING
 import numpy as np
-import pandas as pd
-from sqlalchemy.orm import Session
-from ..db import crud, models
+from ..core.config import settings
 
-# In a real project, this path would point to a model trained on historical data.
+if TYPE_CHECKING:
+    import lightgbm as lgb
+
+# Legacy single-file model, used when the registry has no active version yet.
 MODEL_PATH = "models/lgbm_risk_classifier.txt"
 RISK_CLASSES = ['Low', 'Medium', 'High']
+ACTIVE_POINTER = "ACTIVE"
+
+class RiskModel:
+    """A loaded booster plus the metadata needed to turn a feature dict into a model row."""
+    def __init__(self, booster: "lgb.Booster", version: str, feature_names: list[str],
+                 categorical_levels: dict[str, list[str]] | None = None):
+        self.booster = booster
+        self.version = version
+        # Resolved once per model rather than calling booster.feature_name() per prediction
+        self.feature_names = tuple(feature_names)
+        self.categorical_levels = categorical_levels or {}
+        self._level_codes = {name: {level: i for i, level in enumerate(levels)}
+                             for name, levels in self.categorical_levels.items()}
+
+    def vectorize(self, features: dict) -> list[float]:
+        row = []
+        for name in self.feature_names:
+            value = features.get(name)
+            if name in self._level_codes:
+                value = self._level_codes[name].get(value, -1) # Unseen category
+            row.append(0 if value is None else value)
+        return row
+
+    def predict_proba(self, rows) -> np.ndarray:
+        return np.asarray(self.booster.predict(rows)).reshape(len(rows), -1)
+
+# --- Versioned artifacts on disk ---
+def version_dir(version: str) -> str:
+    return os.path.join(settings.model_registry_dir, version)
+
+def read_active_version() -> str | None:
+    try:
+        with open(os.path.join(settings.model_registry_dir, ACTIVE_POINTER)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def save_model_version(booster: "lgb.Booster", metadata: dict) -> str:
+    """Writes a new immutable model version and returns its id. Does not activate it."""
+    version = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+    path = version_dir(version)
+    os.makedirs(path)
+    booster.save_model(os.path.join(path, "model.txt"))
+    metadata = {**metadata, "version": version, "created_at": datetime.utcnow().isoformat()}
+    with open(os.path.join(path, "metadata.json"), "w") as f:
+        json.dump(metadata, f, indent=2)
+    return version
+
+def activate_version(version: str):
+    """Points every serving worker at `version`. The pointer swap is atomic."""
+    if not os.path.exists(os.path.join(version_dir(version), "model.txt")):
+        raise FileNotFoundError(f"Model version {version} does not exist.")
+    pointer = os.path.join(settings.model_registry_dir, ACTIVE_POINTER)
+    tmp_pointer = f"{pointer}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_pointer, "w") as f:
+        f.write(version)
+    os.replace(tmp_pointer, pointer)
+
+def list_model_versions() -> list[str]:
+    if not os.path.isdir(settings.model_registry_dir):
+        return []
+    return sorted(entry for entry in os.listdir(settings.model_registry_dir)
+                  if os.path.isfile(os.path.join(version_dir(entry), "metadata.json")))
+
+def load_model_version(version: str) -> RiskModel:
+    path = version_dir(version)
+    with open(os.path.join(path, "metadata.json")) as f:
+        metadata = json.load(f)
+    import lightgbm as lgb # Deferred: only paid when a model is actually loaded
+    booster = lgb.Booster(model_file=os.path.join(path, "model.txt"))
+    return RiskModel(booster, version, metadata["feature_names"], metadata.get("categorical_levels"))
 
-try:
-    risk_model = lgb.Booster(model_file=MODEL_PATH)
-except lgb.basic.LightGBMError:
-    print(f"Warning: Model file not found at {MODEL_PATH}. Using dummy prediction logic.")
-    risk_model = None
+def _load_legacy_model() -> RiskModel | None:
+    import lightgbm as lgb
+    try:
+        booster = lgb.Booster(model_file=MODEL_PATH)
+    except lgb.basic.LightGBMError:
+        print(f"Warning: Model file not found at {MODEL_PATH}. Using dummy prediction logic.")
+        return None
+    return RiskModel(booster, "legacy", booster.feature_name())
+
+# --- Serving ---
+class ModelRegistry:
+    """
+    Holds the model this worker serves from. Workers poll the ACTIVE pointer and load
+    new versions on a background thread; predictions keep using the previous model
+    until the new one is fully loaded, then the reference is swapped in one assignment.
+    """
+    def __init__(self, poll_seconds: float):
+        self.poll_seconds = poll_seconds
+        self._model: RiskModel | None = None
+        self._initialised = False
+        self._last_poll = 0.0
+        self._loading = threading.Lock()
+
+    def current(self) -> RiskModel | None:
+        if not self._initialised:
+            self._reload(blocking=True)
+        elif time.monotonic() - self._last_poll >= self.poll_seconds:
+            self._last_poll = time.monotonic()
+            active = read_active_version()
+            if active and (self._model is None or active != self._model.version):
+                threading.Thread(target=self._reload, name="model-reload", daemon=True).start()
+        return self._model
+
+    def _reload(self, blocking: bool = False):
+        if not self._loading.acquire(blocking=blocking):
+            return # Another thread is already loading
+        try:
+            self._last_poll = time.monotonic()
+            active = read_active_version()
+            if active and (self._model is None or active != self._model.version):
+                try:
+                    self._model = load_model_version(active)
+                    print(f"Risk model {active} is now active.")
+                except Exception as e:
+                    print(f"Warning: failed to load model version {active}: {e}")
+            if self._model is None and not self._initialised:
+                self._model = _load_legacy_model()
+            self._initialised = True
+        finally:
+            self._loading.release()
+
+model_registry = ModelRegistry(settings.model_poll_seconds)
+
+def _dummy_probabilities(threat_factor: np.ndarray) -> np.ndarray:
+    # Dummy logic if no model is available
+    base_risk = 0.05 + threat_factor * 0.2
+    probabilities = np.column_stack([1.0 - base_risk, base_risk * 0.6, base_risk * 0.4])
+    return probabilities / probabilities.sum(axis=1, keepdims=True) # Normalize
+
+def _risk_from_probabilities(probabilities: np.ndarray) -> tuple[list[str], np.ndarray]:
+    categories = [RISK_CLASSES[i] for i in np.argmax(probabilities, axis=1)]
+    # Continuous danger score: P(Medium) * 0.5 + P(High) * 1.0
+    danger_scores = np.minimum(1.0, probabilities[:, 1] * 0.5 + probabilities[:, 2] * 1.0)
+    return categories, danger_scores
 
 def predict_segment_risk(features: dict) -> tuple[str, float]:
-    """Predicts risk using the loaded LightGBM model or dummy logic."""
-    if risk_model:
-        # Create a feature vector in the correct order for the model
-        feature_vector = [features.get(f, 0) for f in risk_model.feature_name()]
-        probabilities = risk_model.predict([feature_vector])[0]
+    """Predicts risk using the active LightGBM model or dummy logic."""
+    categories, danger_scores = predict_segment_risk_batch([features])
+    return categories[0], float(danger_scores[0])
+
+def predict_segment_risk_batch(feature_rows: list[dict]) -> tuple[list[str], np.ndarray]:
+    """Scores many segments with a single model call. Returns categories and danger scores."""
+    if not feature_rows:
+        return [], np.zeros(0)
+    model = model_registry.current()
+    if model:
+        probabilities = model.predict_proba([model.vectorize(features) for features in feature_rows])
     else:
-        # Dummy logic if model fails to load
-        threat_factor = features.get("threats_within_2km_last_24h", 0)
-        base_risk = 0.05 + threat_factor * 0.2
-        probabilities = np.array([1.0 - base_risk, base_risk * 0.6, base_risk * 0.4])
-        probabilities /= probabilities.sum() # Normalize
-
-    predicted_class_index = np.argmax(probabilities)
-    categorical_risk = RISK_CLASSES[predicted_class_index]
-    
-    # Continuous danger score: P(Medium) * 0.5 + P(High) * 1.0
-    danger_score = (probabilities[1] * 0.5) + (probabilities[2] * 1.0)
-    
-    return categorical_risk, min(1.0, float(danger_score))
-
-def train_new_model():
-    """Placeholder for an asynchronous model training job."""
-    print("Starting ML model training...")
-    # 1. Load historical segment data and threat incidents.
-    # 2. Perform feature engineering for each data point.
-    # 3. Label data based on outcomes (e.g., segments where incidents occurred are 'High' risk).
-    # 4. Train a LightGBM classifier.
-    # 5. Save the trained model to MODEL_PATH.
-    print("ML model training complete.")
\ No newline at end of file
+        threat_factor = np.array([features.get("threats_within_2km_last_24h", 0) for features in feature_rows], dtype=np.float64)
+        probabilities = _dummy_probabilities(threat_factor)
+    return _risk_from_probabilities(probabilities)
+
+def train_new_model() -> int:
+    """Starts model training in a separate process and returns its PID."""
+    from . import model_training
+    return model_training.start_training_process()
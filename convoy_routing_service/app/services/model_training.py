@@ -0,0 +1,104 @@
+"""
+Out-of-process training for the segment risk classifier.
+
+Runs in its own process (spawned from the API or via
+`python -m app.services.model_training`) so LightGBM training never competes
+with request handling. The result is written as a new registry version and
+activated; serving workers pick it up through `ml_engine.model_registry`.
+"""
+import multiprocessing
+from datetime import datetime
+import numpy as np
+from ..db import crud, database
+from . import ml_engine
+from .threat_features import THREAT_FEATURE, segment_threat_influence
+
+FEATURE_NAMES = ["terrain", "road_class", "elevation", THREAT_FEATURE]
+CATEGORICAL_FEATURES = ["terrain", "road_class"]
+INCIDENT_RADIUS_METERS = 500
+TRAINING_PARAMS = {
+    "objective": "multiclass",
+    "num_class": len(ml_engine.RISK_CLASSES),
+    "learning_rate": 0.05,
+    "num_leaves": 31,
+    "min_data_in_leaf": 5,
+    "verbose": -1,
+}
+NUM_BOOST_ROUNDS = 200
+
+_training_process: multiprocessing.Process | None = None
+
+def label_from_incidents(incident_count: int) -> int:
+    """Segments with repeated nearby incidents are High risk, a single incident is Medium."""
+    if incident_count >= 2:
+        return 2
+    return 1 if incident_count == 1 else 0
+
+def build_training_set(db, reference_time: datetime | None = None):
+    """Builds the feature matrix, labels and categorical vocabularies from historical data."""
+    reference_time = reference_time or datetime.utcnow()
+    segments = crud.get_segment_static_features(db)
+    threat_influence = segment_threat_influence(db, [seg.lon for seg in segments], [seg.lat for seg in segments],
+                                                reference_time)
+    incidents = crud.get_segment_threat_counts(db, INCIDENT_RADIUS_METERS)
+
+    categorical_levels = {
+        "terrain": sorted({seg.terrain_type for seg in segments if seg.terrain_type}),
+        "road_class": sorted({seg.road_classification for seg in segments if seg.road_classification}),
+    }
+    codes = {name: {level: i for i, level in enumerate(levels)} for name, levels in categorical_levels.items()}
+
+    X = np.zeros((len(segments), len(FEATURE_NAMES)), dtype=np.float64)
+    y = np.zeros(len(segments), dtype=np.int32)
+    for i, seg in enumerate(segments):
+        X[i] = (
+            codes["terrain"].get(seg.terrain_type, -1),
+            codes["road_class"].get(seg.road_classification, -1),
+            seg.elevation or 0.0,
+            threat_influence[i],
+        )
+        y[i] = label_from_incidents(incidents.get(seg.id, 0))
+    return X, y, categorical_levels
+
+def train_and_publish() -> str | None:
+    """Trains on the current database contents and activates the result. Returns the new version."""
+    print("Starting ML model training...")
+    db = database.SessionLocal()
+    try:
+        X, y, categorical_levels = build_training_set(db)
+    finally:
+        db.close()
+    if len(y) == 0:
+        print("No road segments available; skipping training.")
+        return None
+
+    import lightgbm as lgb # Only the training process pays for this import
+    dataset = lgb.Dataset(X, label=y, feature_name=FEATURE_NAMES, categorical_feature=CATEGORICAL_FEATURES)
+    booster = lgb.train(TRAINING_PARAMS, dataset, num_boost_round=NUM_BOOST_ROUNDS)
+    version = ml_engine.save_model_version(booster, {
+        "feature_names": FEATURE_NAMES,
+        "categorical_levels": categorical_levels,
+        "risk_classes": ml_engine.RISK_CLASSES,
+        "training_rows": int(len(y)),
+        "class_counts": np.bincount(y, minlength=len(ml_engine.RISK_CLASSES)).tolist(),
+    })
+    ml_engine.activate_version(version)
+    print(f"ML model training complete. Activated version {version}.")
+    return version
+
+def start_training_process() -> int:
+    """Spawns a training process unless one is already running. Returns its PID."""
+    global _training_process
+    if _training_process is not None and _training_process.is_alive():
+        return _training_process.pid
+    # 'spawn' gives the child fresh DB connections instead of sharing the parent's pool
+    context = multiprocessing.get_context("spawn")
+    _training_process = context.Process(target=train_and_publish, name="risk-model-training")
+    _training_process.start()
+    return _training_process.pid
+
+def is_training() -> bool:
+    return _training_process is not None and _training_process.is_alive()
+
+if __name__ == "__main__":
+    train_and_publish()
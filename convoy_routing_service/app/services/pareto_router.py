@@ -0,0 +1,164 @@
+"""
+Bi-objective (distance, cumulative danger_score) route search over the CSR road graph.
+
+The search is confined to routes at most `max_detour` times the shortest distance:
+two distance trees (from start and goal) cut off at that length mark the ellipse of
+nodes such a route can touch, so the work scales with the route, not the network.
+Reverse trees from the goal inside the ellipse give exact per-objective lower bounds
+(shortest remaining distance, lowest remaining risk). Labels are expanded in
+lexicographic order of (distance + distance bound, risk). With that order a
+label can only be dominated by labels already settled at the same node, and
+those arrive with non-decreasing distance, so dominance reduces to "risk is not
+lower than the last settled risk here". Comparing risk + risk bound against the
+goal's best risk prunes every label that cannot improve the frontier.
+"""
+import heapq
+import math
+from typing import NamedTuple
+import numpy as np
+from .graph_snapshot import GraphPath, RoadGraph
+
+DEFAULT_MAX_LABELS = 200_000 # Bounds worst-case latency; the result is flagged as truncated
+DEFAULT_MAX_DETOUR = 1.5 # Longest route considered, relative to the shortest
+
+class ParetoRoute(NamedTuple):
+    distance: float # meters
+    risk: float # sum of danger_score along the path
+    path: GraphPath
+
+class ParetoFrontier(NamedTuple):
+    routes: list[ParetoRoute] # Increasing distance, decreasing risk
+    truncated: bool # True if the label budget ran out before the search completed
+
+def pareto_routes(graph: RoadGraph, start: int, goal: int, risk_epsilon: float = 0.0,
+                  max_detour: float = DEFAULT_MAX_DETOUR, max_risk_weight: float = 0.0,
+                  max_labels: int = DEFAULT_MAX_LABELS) -> ParetoFrontier:
+    """
+    Computes every non-dominated (distance, risk) route from start to goal no longer than
+    max_detour times the shortest route, in one search. The length limit is raised where
+    needed so the route minimising distance + risk * w is always included for every
+    w <= max_risk_weight. A positive risk_epsilon treats risks within epsilon as equal,
+    trading exactness for speed.
+    """
+    shortest = graph.astar(start, goal, 0.0)
+    if shortest is None:
+        return ParetoFrontier([], False)
+    shortest_segments = np.asarray(shortest.segments, dtype=np.int64)
+    shortest_distance = float(graph.segment_distance[shortest_segments].sum())
+    shortest_risk = float(graph.risk[shortest_segments].sum())
+    # A weighted optimum costs no more than the shortest route under the same weight, and
+    # its length is at most that cost
+    limit = max(max_detour * shortest_distance, shortest_distance + max_risk_weight * shortest_risk)
+    limit *= 1 + 1e-9 # Summation order differs between searches; keep the shortest route itself inside
+
+    from_start = graph.dijkstra(start, distance_weight=1.0, risk_weight=0.0, budget=limit).cost
+    from_goal = graph.dijkstra(goal, distance_weight=1.0, risk_weight=0.0, budget=limit).cost
+    allowed = from_start + from_goal <= limit
+    # The graph is undirected, so trees rooted at the goal bound the remaining cost from any node
+    distance_bound = np.where(allowed, from_goal, math.inf)
+    risk_bound = graph.dijkstra(goal, distance_weight=0.0, risk_weight=1.0, allowed=allowed).cost
+    distance_bound, risk_bound = distance_bound.tolist(), risk_bound.tolist()
+
+    # Label storage: parallel lists indexed by label id
+    label_node, label_segment, label_parent = [start], [-1], [-1]
+    best_risk: dict[int, float] = {} # Risk of the last label settled at each node
+    heap = [(distance_bound[start], 0.0, 0.0, 0)] # (distance + bound, risk, distance, label id)
+    goal_labels = []
+    goal_risk = math.inf
+    settled = 0
+
+    while heap:
+        _, risk, distance, label = heapq.heappop(heap)
+        node = label_node[label]
+        if risk >= best_risk.get(node, math.inf) - risk_epsilon:
+            continue # Dominated by a label settled here since this one was queued
+        if risk + risk_bound[node] >= goal_risk - risk_epsilon:
+            continue # Cannot beat any route already found
+        best_risk[node] = risk
+        settled += 1
+        if node == goal:
+            goal_labels.append((distance, risk, label))
+            goal_risk = risk
+            continue
+        if settled >= max_labels:
+            return ParetoFrontier(_to_routes(goal_labels, label_node, label_segment, label_parent), True)
+
+        lo, hi = graph.indptr[node], graph.indptr[node + 1]
+        neighbours = graph.indices[lo:hi].tolist()
+        segments = graph.edge_segment[lo:hi]
+        new_distances = (distance + graph.segment_distance[segments]).tolist()
+        new_risks = (risk + graph.risk[segments]).tolist()
+        for nbr, seg, new_distance, new_risk in zip(neighbours, segments.tolist(), new_distances, new_risks):
+            if new_distance + distance_bound[nbr] > limit:
+                continue # Longer than the detour limit (or outside the ellipse)
+            if new_risk + risk_bound[nbr] >= goal_risk - risk_epsilon:
+                continue
+            if new_risk >= best_risk.get(nbr, math.inf) - risk_epsilon:
+                continue
+            label_node.append(nbr)
+            label_segment.append(seg)
+            label_parent.append(label)
+            heapq.heappush(heap, (new_distance + distance_bound[nbr], new_risk, new_distance, len(label_node) - 1))
+
+    return ParetoFrontier(_to_routes(goal_labels, label_node, label_segment, label_parent), False)
+
+def _to_routes(goal_labels, label_node, label_segment, label_parent) -> list[ParetoRoute]:
+    routes = []
+    for distance, risk, label in goal_labels:
+        nodes, segments = [], []
+        while label != -1:
+            nodes.append(label_node[label])
+            if label_segment[label] != -1:
+                segments.append(label_segment[label])
+            label = label_parent[label]
+        nodes.reverse()
+        segments.reverse()
+        routes.append(ParetoRoute(distance, risk, GraphPath(nodes, segments)))
+    return routes
+
+def select_route(routes: list[ParetoRoute], risk_weight: float) -> int | None:
+    """
+    Index of the frontier route minimising distance + risk * risk_weight. On an exact
+    frontier (risk_epsilon=0) that is the route a single-objective search with this weight
+    returns, provided pareto_routes was given max_risk_weight >= risk_weight. On an epsilon
+    frontier it can be slightly worse; add_mode_routes gives exact picks there.
+    """
+    if not routes:
+        return None
+    return min(range(len(routes)), key=lambda i: routes[i].distance + routes[i].risk * risk_weight)
+
+def add_mode_routes(graph: RoadGraph, start: int, goal: int, routes: list[ParetoRoute],
+                    risk_weights: dict[str, float]) -> tuple[list[ParetoRoute], dict[str, int]]:
+    """
+    Adds the exact single-objective route for each mode (the one /get_route returns) to an
+    epsilon frontier unless it is already on it. Costs one A* search per mode, so exact
+    frontiers should use select_route instead. Returns the merged routes, still ordered by
+    distance, and the index of each mode's route.
+    """
+    routes = list(routes)
+    mode_paths = {}
+    for mode, risk_weight in risk_weights.items():
+        path = graph.astar(start, goal, risk_weight)
+        if path is None:
+            continue
+        existing = next((i for i, route in enumerate(routes) if route.path.segments == path.segments), None)
+        if existing is None:
+            segments = np.asarray(path.segments, dtype=np.int64)
+            routes.append(ParetoRoute(float(graph.segment_distance[segments].sum()),
+                                      float(graph.risk[segments].sum()), path))
+        mode_paths[mode] = path.segments
+    routes.sort(key=lambda route: (route.distance, route.risk))
+    index_by_segments = {tuple(route.path.segments): i for i, route in enumerate(routes)}
+    return routes, {mode: index_by_segments[tuple(segments)] for mode, segments in mode_paths.items()}
+
+def thin_frontier(routes: list[ParetoRoute], max_routes: int, keep: set[int]) -> list[int]:
+    """Evenly spaced subset of at most max(max_routes, len(keep)) frontier indices that always includes `keep`."""
+    if len(routes) <= max_routes:
+        return list(range(len(routes)))
+    slots = max(max_routes - len(keep), 0)
+    if slots <= 1:
+        sampled = set(range(min(slots, len(routes))))
+    else:
+        step = (len(routes) - 1) / (slots - 1)
+        sampled = {round(i * step) for i in range(slots)}
+    return sorted(sampled | keep)
@@ -1,6 +1,15 @@
 from fpdf import FPDF
+import csv
 import io
 
+MISSION_CSV_HEADER = ["timestamp", "severity", "message"]
+BULK_CSV_HEADER = ["mission_id", "call_sign", "timestamp", "severity", "message"]
+
+class _RowBuffer:
+    """File-like sink that hands each formatted CSV row straight back to the caller."""
+    def write(self, value: str) -> str:
+        return value
+
 def create_mission_pdf(mission_data) -> bytes:
     """Generates a PDF report for a completed mission."""
     pdf = FPDF()
@@ -11,12 +20,27 @@ def create_mission_pdf(mission_data) -> bytes:
     # ... add more details to the PDF
     return pdf.output(dest='S').encode('latin-1')
 
+def _alert_row(alert: dict) -> list:
+    return [alert.get('timestamp'), alert.get('severity'), alert.get('message')]
+
+def iter_mission_csv(alerts_data):
+    """Yields the alerts CSV for a single mission one row at a time."""
+    writer = csv.writer(_RowBuffer())
+    yield writer.writerow(MISSION_CSV_HEADER)
+    for alert in alerts_data or []:
+        yield writer.writerow(_alert_row(alert))
+
+def iter_bulk_missions_csv(missions):
+    """Yields one CSV covering the alerts of every mission in `missions`, row by row."""
+    writer = csv.writer(_RowBuffer())
+    yield writer.writerow(BULK_CSV_HEADER)
+    for mission in missions:
+        for alert in mission.alerts_triggered or []:
+            yield writer.writerow([mission.id, mission.call_sign, *_alert_row(alert)])
+
 def create_mission_csv(alerts_data) -> io.StringIO:
     """Generates a CSV of alerts triggered during a mission."""
     output = io.StringIO()
-    # In a real app, use the `csv` module to write data
-    output.write("timestamp,severity,message\n")
-    for alert in alerts_data:
-        output.write(f"{alert['timestamp']},{alert['severity']},{alert['message']}\n")
+    output.writelines(iter_mission_csv(alerts_data))
     output.seek(0)
-    return output
\ No newline at end of file
+    return output
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from ..api import schemas
+from ..core.config import settings
+from ..db import crud, database
+from . import report_generator
+
+# Bump when the report layout changes so stale artifacts are not served from the cache.
+REPORT_TEMPLATE_VERSION = 1
+
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{64}") # Job ids are sha256 hex digests
+
+REPORT_FORMATS = {
+    "pdf": ("application/pdf", report_generator.create_mission_pdf),
+}
+
+def mission_fingerprint(mission, fmt: str) -> str:
+    """Content hash of everything that ends up in a report. Completed missions are immutable."""
+    payload = {
+        "template": REPORT_TEMPLATE_VERSION,
+        "format": fmt,
+        "id": mission.id,
+        "convoy_id": mission.convoy_id,
+        "call_sign": mission.call_sign,
+        "start_time": mission.start_time,
+        "end_time": mission.end_time,
+        "total_distance_km": mission.total_distance_km,
+        "final_status": mission.final_status,
+        "route_taken": mission.route_taken,
+        "alerts_triggered": mission.alerts_triggered,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+# Job state lives next to the artifacts on disk so every worker process sees the same jobs:
+# the job id is the artifact's content hash, `<id>.json` records what was requested,
+# `<id>.<format>` is the finished report and `<id>.failed` holds the error of a failed run.
+# Only whether this process is currently rendering a job is kept in memory. The metadata names
+# the owning process, so a job whose owner died before finishing is reported as failed and
+# can be resubmitted instead of staying queued forever.
+class ReportJobManager:
+    def __init__(self, cache_dir: str, max_workers: int):
+        self.cache_dir = cache_dir
+        self._max_workers = max_workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._in_flight: dict[str, str] = {} # Job id -> "queued" | "running", for jobs rendering here
+        self._futures: dict[str, Future] = {}
+        self._owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="report")
+        return self._executor
+
+    def artifact_path(self, artifact_key: str, fmt: str) -> str:
+        return os.path.join(self.cache_dir, f"{artifact_key}.{fmt}")
+
+    def _metadata_path(self, job_id: str) -> str:
+        return os.path.join(self.cache_dir, f"{job_id}.json")
+
+    def _failure_path(self, job_id: str) -> str:
+        return os.path.join(self.cache_dir, f"{job_id}.failed")
+
+    def get_cached_artifact(self, mission, fmt: str) -> str | None:
+        path = self.artifact_path(mission_fingerprint(mission, fmt), fmt)
+        return path if os.path.exists(path) else None
+
+    def _read_metadata(self, job_id: str) -> dict | None:
+        try:
+            with open(self._metadata_path(job_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _owner_alive(self, job_id: str, metadata: dict) -> bool:
+        """Whether the process that queued an unfinished job may still finish it."""
+        owner = metadata.get("owner")
+        if owner == self._owner:
+            return job_id in self._in_flight
+        host, _, pid = (owner or "").rpartition(":")
+        if host == socket.gethostname() and pid.isdigit():
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                return False
+            except PermissionError:
+                pass # Exists under another user
+            return True
+        # Another host's process cannot be probed; trust it until the job goes quiet for too long
+        age = time.time() - os.path.getmtime(self._metadata_path(job_id))
+        return age < settings.report_job_stale_seconds
+
+    def submit(self, mission, fmt: str) -> schemas.ReportJob:
+        """Queues report generation, reusing a cached artifact or an in-flight job for the same content."""
+        job_id = mission_fingerprint(mission, fmt)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._lock:
+            if os.path.exists(self.artifact_path(job_id, fmt)):
+                return self.get_job(job_id)
+            metadata = self._read_metadata(job_id)
+            failed = os.path.exists(self._failure_path(job_id))
+            if metadata and not failed and self._owner_alive(job_id, metadata):
+                return self.get_job(job_id) # Queued or running here or in another worker
+            if failed:
+                os.remove(self._failure_path(job_id)) # Resubmitting retries a failed job
+            self._in_flight[job_id] = "queued"
+            metadata = {"mission_id": mission.id, "format": fmt, "created_at": datetime.utcnow().isoformat(),
+                        "owner": self._owner}
+            _write_atomic(self._metadata_path(job_id), json.dumps(metadata).encode())
+            self._futures[job_id] = self._get_executor().submit(self._run, job_id, mission.id, fmt)
+        return self.get_job(job_id)
+
+    def get_job(self, job_id: str) -> schemas.ReportJob | None:
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        metadata = self._read_metadata(job_id)
+        if metadata is None:
+            return None
+        job = schemas.ReportJob(id=job_id, mission_id=metadata["mission_id"], format=metadata["format"],
+                                created_at=datetime.fromisoformat(metadata["created_at"]))
+        artifact = self.artifact_path(job_id, job.format)
+        if os.path.exists(artifact):
+            job.status = "completed"
+            job.completed_at = datetime.utcfromtimestamp(os.path.getmtime(artifact))
+        elif os.path.exists(self._failure_path(job_id)):
+            job.status = "failed"
+            job.completed_at = datetime.utcfromtimestamp(os.path.getmtime(self._failure_path(job_id)))
+            with open(self._failure_path(job_id)) as f:
+                job.error = f.read()
+        elif self._owner_alive(job_id, metadata):
+            # Not finished on disk: either rendering here, or queued/running in another worker
+            job.status = self._in_flight.get(job_id, "queued")
+        else:
+            job.status = "failed"
+            job.error = "The worker rendering this report stopped before finishing; resubmit to retry."
+        return job
+
+    def _run(self, job_id: str, mission_id: int, fmt: str):
+        with self._lock:
+            self._in_flight[job_id] = "running"
+        db = None
+        try:
+            os.utime(self._metadata_path(job_id)) # Marks the job active for workers on other hosts
+            db = database.SessionLocal()
+            mission = crud.get_completed_mission(db, mission_id)
+            if not mission:
+                raise LookupError(f"Mission {mission_id} no longer exists.")
+            _, render = REPORT_FORMATS[fmt]
+            _write_atomic(self.artifact_path(job_id, fmt), render(mission))
+        except Exception as e:
+            _write_atomic(self._failure_path(job_id), str(e).encode())
+        finally:
+            if db is not None:
+                db.close()
+            with self._lock:
+                self._in_flight.pop(job_id, None)
+                self._futures.pop(job_id, None)
+
+    def shutdown(self):
+        """Stops taking work. Jobs still queued are recorded as failed so they can be resubmitted."""
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        with self._lock:
+            cancelled = [job_id for job_id, future in self._futures.items() if future.cancelled()]
+            for job_id in cancelled:
+                _write_atomic(self._failure_path(job_id), b"Cancelled by a worker shutdown; resubmit to retry.")
+                self._in_flight.pop(job_id, None)
+                self._futures.pop(job_id, None)
+
+def _write_atomic(path: str, content: bytes):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path) # Atomic publish; readers never see a partial file
+
+report_job_manager = ReportJobManager(settings.report_cache_dir, settings.report_worker_threads)
@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..db import crud, database
+
+HISTORY_SIZE = 50_000 # Events kept in memory for resuming clients
+DB_RETENTION = 10 * HISTORY_SIZE # Rows kept in the risk_changes table
+SUBSCRIBER_QUEUE_SIZE = 256 # Pending batches per client before it is told to resync
+POLL_BATCH_SIZE = 5000
+GAP_GRACE_SECONDS = 5.0 # How long a missing id may still turn up from a slower committing transaction
+
+class RiskEvent(NamedTuple):
+    version: int
+    segment_id: int
+    score: float
+    category: str
+    lon: float | None
+    lat: float | None
+
+    def compact(self) -> list:
+        return [self.version, self.segment_id, round(self.score, 4), self.category]
+
+BBox = tuple[float, float, float, float] # min_lon, min_lat, max_lon, max_lat
+
+def in_bbox(event: RiskEvent, bbox: BBox | None) -> bool:
+    if bbox is None or event.lon is None or event.lat is None:
+        return True
+    return bbox[0] <= event.lon <= bbox[2] and bbox[1] <= event.lat <= bbox[3]
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop, bbox: BBox | None):
+        self.loop = loop
+        self.bbox = bbox
+        self.queue: asyncio.Queue[list[RiskEvent]] = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def _deliver(self, events: list[RiskEvent]):
+        # Runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(events)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+class RiskChangeFeed:
+    """
+    Versioned stream of segment risk changes shared by all worker processes. Publishers
+    (request handlers, the rescoring job) append changes to the risk_changes table; each
+    worker polls the table on a background thread and fans new rows out to its own
+    WebSocket subscribers through their bounded queues, and to in-process listeners such
+    as the routing risk overlay. Row ids are the versions, so a client can resume against
+    any worker.
+    """
+    def __init__(self, poll_seconds: float, history_size: int = HISTORY_SIZE):
+        self.poll_seconds = poll_seconds
+        self.version = 0
+        self._history: deque[RiskEvent] = deque(maxlen=history_size)
+        self._subscriptions: set[Subscription] = set()
+        self._listeners: list = []
+        self._lock = threading.Lock()
+        self._gap_since: float | None = None
+        self._pruned_through = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def publish(self, db: Session, changes: list[dict], locations: dict[int, tuple[float, float]] | None = None):
+        """
+        Records changes shaped like {"id", "danger_score", "risk_category"}. `locations` maps
+        segment id to (lon, lat) for bounding-box filtering. Subscribers get them on the next poll.
+        """
+        locations = locations or {}
+        rows = []
+        for change in changes:
+            lon, lat = locations.get(change["id"], (None, None))
+            rows.append({"segment_id": change["id"], "danger_score": float(change["danger_score"]),
+                         "risk_category": change["risk_category"], "lon": lon, "lat": lat})
+        crud.write_risk_changes(db, rows)
+
+    def start(self):
+        """Starts following the change table from its current end."""
+        if self._thread is not None:
+            return
+        db = database.SessionLocal()
+        try:
+            self.version = self._pruned_through = crud.get_latest_risk_change_id(db)
+        finally:
+            db.close()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="risk-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.poll_seconds):
+            db = database.SessionLocal()
+            try:
+                while self.poll(db) == POLL_BATCH_SIZE:
+                    pass # Drain a large burst (e.g. a rescoring pass) before sleeping again
+                self._prune(db)
+            except Exception as e:
+                print(f"Risk feed poll failed: {e}")
+            finally:
+                db.close()
+
+    def poll(self, db: Session) -> int:
+        """Fans out rows committed since the last poll. Returns the number of events fanned out."""
+        rows = crud.get_risk_changes_after(db, self.version, POLL_BATCH_SIZE)
+        events = []
+        expected = self.version + 1
+        for row in rows:
+            if row.id != expected:
+                # Ids are assigned at insert but may commit out of order; wait briefly for the
+                # missing ones before treating them as rolled back
+                if self._gap_since is None:
+                    self._gap_since = time.monotonic()
+                if time.monotonic() - self._gap_since < GAP_GRACE_SECONDS:
+                    break
+            self._gap_since = None
+            events.append(RiskEvent(row.id, row.segment_id, row.danger_score, row.risk_category, row.lon, row.lat))
+            expected = row.id + 1
+        if events:
+            self._fan_out(events)
+        return len(events)
+
+    def _fan_out(self, events: list[RiskEvent]):
+        with self._lock:
+            self._history.extend(events)
+            self.version = events[-1].version
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            matching = [event for event in events if in_bbox(event, subscription.bbox)]
+            if matching:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription._deliver, matching)
+                except RuntimeError:
+                    self.unsubscribe(subscription) # Loop already closed
+        for listener in self._listeners:
+            try:
+                listener(events)
+            except Exception as e:
+                print(f"Risk feed listener failed: {e}")
+
+    def add_listener(self, listener):
+        """Calls `listener(events)` on the poll thread with every new batch of events, in version order."""
+        self._listeners.append(listener)
+
+    def _prune(self, db: Session):
+        # Every worker may prune; deleting the same old rows twice is harmless
+        if self.version - self._pruned_through >= HISTORY_SIZE:
+            crud.delete_risk_changes_through(db, self.version - DB_RETENTION)
+            self._pruned_through = self.version
+
+    def subscribe(self, bbox: BBox | None, since: int | None) -> tuple[Subscription, list[RiskEvent] | None]:
+        """
+        Registers a subscription on the running loop and returns it with the backlog after
+        `since`. The backlog is None when `since` is older than this worker's history.
+        Registration and backlog are taken under one lock so no event is missed or repeated.
+        """
+        subscription = Subscription(asyncio.get_running_loop(), bbox)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            if since is None or since >= self.version:
+                # A version ahead of ours was seen on a worker that polled first; the
+                # endpoint skips events up to it
+                return subscription, []
+            oldest = self._history[0].version if self._history else self.version + 1
+            if since < oldest - 1:
+                return subscription, None
+            backlog = [event for event in self._history if event.version > since and in_bbox(event, bbox)]
+        return subscription, backlog
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+risk_feed = RiskChangeFeed(settings.risk_feed_poll_seconds)
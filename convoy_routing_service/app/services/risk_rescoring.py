@@ -0,0 +1,85 @@
+import math
+from datetime import datetime
+import numpy as np
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..db import crud, database
+from . import ml_engine, route_optimizer
+from .risk_feed import risk_feed
+from .threat_features import decayed_threat_influence, load_threat_weights, segment_feature_row
+
+RESCORING_JOB_ID = "risk_rescoring"
+RESCORING_LOCK_NAME = "convoy_routing.risk_rescoring"
+RESCORING_SCHEDULER_LOCK_NAME = "convoy_routing.risk_rescoring.scheduler"
+SCORE_EPSILON = 0.01 # Score moves smaller than this are not written back
+
+def rescore_network(db: Session, now: datetime | None = None) -> dict:
+    """
+    Re-scores every road segment in id-ordered chunks and writes back only the segments
+    whose category changed or whose score moved by at least SCORE_EPSILON.
+    """
+    now = now or datetime.utcnow()
+    threat_lon, threat_lat, threat_weight = load_threat_weights(db, now)
+    scanned = 0
+    changes = []
+    last_id = 0
+    while True:
+        chunk = crud.get_segment_scoring_chunk(db, last_id, settings.risk_rescore_chunk_size)
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+        scanned += len(chunk)
+
+        seg_lon = np.array([row.lon for row in chunk], dtype=np.float64)
+        seg_lat = np.array([row.lat for row in chunk], dtype=np.float64)
+        influence = decayed_threat_influence(seg_lon, seg_lat, threat_lon, threat_lat, threat_weight)
+        feature_rows = [segment_feature_row(row, influence[i]) for i, row in enumerate(chunk)]
+        categories, scores = ml_engine.predict_segment_risk_batch(feature_rows)
+
+        updates = []
+        for row, category, score in zip(chunk, categories, scores):
+            score = round(float(score), 4)
+            previous = row.danger_score or 0.0
+            if category != row.risk_category or math.fabs(score - previous) >= SCORE_EPSILON:
+                updates.append({"id": row.id, "risk_category": category, "danger_score": score})
+        crud.bulk_update_segment_risk(db, updates)
+        route_optimizer.apply_risk_changes(updates)
+        risk_feed.publish(db, updates, {row.id: (row.lon, row.lat) for row in chunk})
+        changes.extend(updates)
+
+    return {"scanned": scanned, "changed": len(changes), "changes": changes}
+
+def run_rescoring():
+    """
+    Runs one rescoring pass with its own DB session. A database lock keeps passes from
+    overlapping when a manual trigger lands while another process is mid-pass.
+    """
+    with database.advisory_lock(RESCORING_LOCK_NAME) as acquired:
+        if not acquired:
+            print("Risk rescoring skipped: another process is already running it.")
+            return None
+        db = database.SessionLocal()
+        try:
+            result = rescore_network(db)
+            print(f"Risk rescoring: {result['changed']} of {result['scanned']} segments changed.")
+            return result
+        except Exception as e:
+            print(f"Risk rescoring failed: {e}")
+        finally:
+            db.close()
+
+# Every worker process schedules the job; only the holder of this lock runs it
+_scheduler_lock = database.HeldLock(RESCORING_SCHEDULER_LOCK_NAME)
+
+def run_scheduled_rescoring():
+    if _scheduler_lock.try_hold():
+        return run_rescoring()
+    return None
+
+def schedule_rescoring(scheduler):
+    scheduler.add_job(run_scheduled_rescoring, "interval", minutes=settings.risk_rescore_interval_minutes,
+                      id=RESCORING_JOB_ID, replace_existing=True, max_instances=1, coalesce=True)
+
+def release_rescoring_schedule():
+    """Lets another worker take over the scheduled passes; call on shutdown."""
+    _scheduler_lock.release()
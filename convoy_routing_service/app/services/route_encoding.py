@@ -0,0 +1,53 @@
+POLYLINE_PRECISION = 5
+
+def _encode_value(value: int) -> str:
+    value = ~(value << 1) if value < 0 else value << 1
+    chunks = []
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+def encode_polyline(coordinates, precision: int = POLYLINE_PRECISION) -> str:
+    """Encodes (lon, lat) coordinates with the Google encoded-polyline algorithm (lat/lon order on the wire)."""
+    factor = 10 ** precision
+    encoded = []
+    prev_lat = prev_lon = 0
+    for lon, lat in coordinates:
+        lat_i, lon_i = round(lat * factor), round(lon * factor)
+        encoded.append(_encode_value(lat_i - prev_lat))
+        encoded.append(_encode_value(lon_i - prev_lon))
+        prev_lat, prev_lon = lat_i, lon_i
+    return "".join(encoded)
+
+def build_risk_heatmap(path_nodes, segments) -> list[list[float]]:
+    """One [risk, lon, lat] point per segment, placed at the segment midpoint."""
+    return [
+        [seg['risk_score'], (a[0] + b[0]) / 2, (a[1] + b[1]) / 2]
+        for a, b, seg in zip(path_nodes, path_nodes[1:], segments)
+    ]
+
+def build_route_response(path_nodes, path_details, fuel_estimate: float) -> dict:
+    segments = path_details['segments']
+    return {
+        "path_geometry": {"type": "LineString", "coordinates": path_nodes},
+        "total_distance_km": path_details['total_distance'] / 1000,
+        "estimated_fuel_liters": fuel_estimate,
+        "segments": segments,
+        "risk_heatmap": build_risk_heatmap(path_nodes, segments),
+    }
+
+def build_compact_route_response(path_nodes, path_details, fuel_estimate: float, include_heatmap: bool = False) -> dict:
+    """Columnar route payload with an encoded polyline instead of a GeoJSON coordinate list."""
+    segments = path_details['segments']
+    return {
+        "encoding": f"polyline{POLYLINE_PRECISION}",
+        "path_polyline": encode_polyline(path_nodes),
+        "total_distance_km": path_details['total_distance'] / 1000,
+        "estimated_fuel_liters": fuel_estimate,
+        "segment_ids": [seg['segment_id'] for seg in segments],
+        "segment_distances_km": [seg['distance_km'] for seg in segments],
+        "segment_risks": [seg['risk_score'] for seg in segments],
+        "risk_heatmap": build_risk_heatmap(path_nodes, segments) if include_heatmap else None,
+    }
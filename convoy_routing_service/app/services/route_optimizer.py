@@ -1,58 +1,113 @@
-import networkx as nx
+import os
+import threading
+import time
+import numpy as np
 from sqlalchemy.orm import Session
+from ..core.config import settings
 from ..db import crud
+from .graph_snapshot import GraphPath, RoadGraph, load_snapshot, write_snapshot
+from .graph_tiles import corridor_graphs, tile_cache
+from .risk_feed import RiskEvent, risk_feed
+
+# Per-worker whole-network graph, only ever backed by the memory-mapped snapshot (shared
+# between workers via the page cache); only the risk overlay is private. It is kept current
+# by the risk feed, with an occasional full re-read to catch anything the feed skipped.
+# Without a snapshot, requests route over corridor tiles from graph_tiles instead.
+_routing_graph: RoadGraph | None = None
+_risk_refreshed_at = 0.0
+_graph_lock = threading.Lock()
+
+MODE_RISK_WEIGHTS = {"stealth": 20.0, "speed": 5.0, "balance": 10.0}
 
 def get_risk_weight(mode: str) -> float:
     """Returns the risk multiplier based on the operational mode."""
-    modes = {"stealth": 20.0, "speed": 5.0, "balance": 10.0}
-    return modes.get(mode, 10.0)
+    return MODE_RISK_WEIGHTS.get(mode, 10.0)
 
-def build_weighted_graph(db: Session, mode: str = "balance"):
-    """Builds the NetworkX graph with dynamically calculated edge costs."""
-    G = nx.Graph()
-    segments = crud.get_all_road_segments(db)
-    risk_weight = get_risk_weight(mode)
+# --- Shared CSR graph ---
+def export_graph_snapshot(db: Session, path: str | None = None) -> RoadGraph:
+    """Builds the CSR road graph from the database and writes it as a snapshot file."""
+    graph = RoadGraph.from_segment_rows(crud.get_segment_endpoints(db))
+    write_snapshot(graph, path or settings.graph_snapshot_path)
+    return graph
 
-    for seg in segments:
-        start_node = seg.geometry.coords[0]
-        end_node = seg.geometry.coords[-1]
-        cost = seg.length + (seg.danger_score * risk_weight)
-        G.add_edge(start_node, end_node, weight=cost, segment_id=seg.id,
-                   raw_distance=seg.length, raw_risk=seg.danger_score)
-    return G
-
-def find_nearest_node(graph, point_coords):
-    """Finds the graph node closest to a given (lon, lat) point."""
-    lon, lat = point_coords
-    return min(graph.nodes(), key=lambda node: ((node[0] - lon)**2 + (node[1] - lat)**2)**0.5)
-
-def heuristic_distance(a, b):
-    """Calculates Euclidean distance for the A* heuristic."""
-    return ((a[0] - b[0])**2 + (a[1] - b[1])**2)**0.5
-
-def find_astar_path(graph, start_node, end_node):
-    """Finds the shortest path using the A* algorithm."""
-    try:
-        return nx.astar_path(graph, source=start_node, target=end_node,
-                             heuristic=heuristic_distance, weight='weight')
-    except (nx.NetworkXNoPath, nx.NodeNotFound):
+def load_graph_snapshot(path: str | None = None) -> bool:
+    """Maps the snapshot into this worker if it exists. Returns whether a snapshot was loaded."""
+    global _routing_graph, _risk_refreshed_at
+    path = path or settings.graph_snapshot_path
+    if not os.path.exists(path):
+        return False
+    with _graph_lock:
+        _routing_graph = load_snapshot(path)
+        _risk_refreshed_at = 0.0 # Snapshot risk may be stale; refresh on first use
+    return True
+
+def refresh_risk_overlay(db: Session, graph: RoadGraph):
+    global _risk_refreshed_at
+    rows = crud.get_segment_risk_scores(db)
+    graph.update_risk([row[0] for row in rows], [row[1] or 0.0 for row in rows])
+    _risk_refreshed_at = time.monotonic()
+
+def get_routing_graph(db: Session) -> RoadGraph | None:
+    """
+    Returns the snapshot graph, mapping it on first use. None when no snapshot has been
+    exported. One request re-reads the risk column once the refresh interval has passed;
+    requests arriving meanwhile use the current overlay rather than repeating the scan.
+    """
+    if _routing_graph is None and not load_graph_snapshot():
         return None
+    graph = _routing_graph
+    if time.monotonic() - _risk_refreshed_at >= settings.risk_overlay_refresh_seconds:
+        if _graph_lock.acquire(blocking=False):
+            try:
+                if time.monotonic() - _risk_refreshed_at >= settings.risk_overlay_refresh_seconds:
+                    refresh_risk_overlay(db, graph)
+            finally:
+                _graph_lock.release()
+    return graph
+
+def has_snapshot() -> bool:
+    """Whether routing uses the whole-network snapshot rather than corridor tiles."""
+    return _routing_graph is not None or os.path.exists(settings.graph_snapshot_path)
+
+def routing_graphs(db: Session, points: list[tuple[float, float]], margin: int | None = None):
+    """
+    Yields the graphs to search for a request touching the given (lon, lat) points: the
+    snapshot graph once, or corridor subgraphs of growing width (just one at `margin` if given).
+    Callers stop iterating as soon as a graph answers the request.
+    """
+    graph = get_routing_graph(db) if has_snapshot() else None
+    if graph is not None:
+        yield graph
+        return
+    yield from corridor_graphs(db, points, margin)
+
+def plan_route(db: Session, start: tuple[float, float], end: tuple[float, float],
+               mode: str = "balance") -> tuple[RoadGraph | None, GraphPath | None]:
+    """
+    Routes between two (lon, lat) points. Returns the graph the path refers to and the
+    path, or (None, None) when there is no path.
+    """
+    risk_weight = get_risk_weight(mode)
+    for graph in routing_graphs(db, [start, end]):
+        if graph.node_count == 0:
+            continue
+        path = graph.astar(graph.nearest_node(*start), graph.nearest_node(*end), risk_weight)
+        if path:
+            return graph, path
+    return None, None
+
+def apply_risk_changes(changes: list[dict]):
+    """Pushes risk updates into the overlay and cached tiles without a DB round trip."""
+    if not changes:
+        return
+    tile_cache.apply_risk_changes(changes)
+    if _routing_graph is None:
+        return
+    _routing_graph.update_risk([c["id"] for c in changes], np.array([c["danger_score"] for c in changes]))
+
+def _apply_feed_events(events: list[RiskEvent]):
+    # Changes published by every worker, including this one; the latest event per segment wins
+    latest = {event.segment_id: event.score for event in events}
+    apply_risk_changes([{"id": segment_id, "danger_score": score} for segment_id, score in latest.items()])
 
-def get_path_details(graph, path_nodes):
-    """Extracts segment details and total distance from a path of nodes."""
-    segments = []
-    total_distance = 0
-    for i in range(len(path_nodes) - 1):
-        edge_data = graph.get_edge_data(path_nodes[i], path_nodes[i+1])
-        total_distance += edge_data['raw_distance']
-        segments.append({
-            "segment_id": edge_data['segment_id'],
-            "distance_km": edge_data['raw_distance'] / 1000,
-            "risk_score": edge_data['raw_risk']
-        })
-    return {"segments": segments, "total_distance": total_distance}
-
-def get_path_segment_ids(graph, path_nodes):
-    """Converts a path of nodes to a list of segment IDs."""
-    return [graph.get_edge_data(path_nodes[i], path_nodes[i+1])['segment_id'] 
-            for i in range(len(path_nodes) - 1)]
\ No newline at end of file
+risk_feed.add_listener(_apply_feed_events)
@@ -1,16 +1,27 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from .convoy_manager import convoy_manager
+from .risk_rescoring import RESCORING_JOB_ID
 
 # Global simulation state
 SIMULATION_TIME_SCALE = 1.0
+# Started by the app lifespan rather than at import, so CLI tools and tests don't spawn its thread
 scheduler = BackgroundScheduler()
-scheduler.start()
+
+def start_scheduler():
+    if not scheduler.running:
+        scheduler.start()
+
+def shutdown_scheduler():
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
 
 def set_time_scale(scale: int):
     global SIMULATION_TIME_SCALE
     SIMULATION_TIME_SCALE = float(scale)
-    # Reschedule jobs with the new interval
+    # Reschedule simulation jobs with the new interval; maintenance jobs keep their own cadence
     for job in scheduler.get_jobs():
+        if job.id == RESCORING_JOB_ID:
+            continue
         job.reschedule(trigger='interval', seconds=10 / SIMULATION_TIME_SCALE)
 
 def run_convoy_movement(convoy_id: str):
@@ -0,0 +1,60 @@
+"""
+The threat feature of the risk model, computed the same way for training, periodic
+rescoring and new-threat handling: the time-decayed count of threats within
+THREAT_RADIUS_METERS of each segment centroid. It keeps the historical feature name
+`threats_within_2km_last_24h` so existing model versions still load.
+"""
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..db import crud
+
+THREAT_FEATURE = "threats_within_2km_last_24h"
+THREAT_RADIUS_METERS = 2000
+EARTH_RADIUS_METERS = 6_371_000.0
+THREAT_BLOCK_SIZE = 2048 # Bounds the segment x threat distance matrix per step
+
+def decayed_threat_influence(seg_lon: np.ndarray, seg_lat: np.ndarray, threat_lon: np.ndarray,
+                             threat_lat: np.ndarray, threat_weight: np.ndarray) -> np.ndarray:
+    """Sum of decayed weights of threats within THREAT_RADIUS_METERS of each segment centroid."""
+    influence = np.zeros(len(seg_lon))
+    if len(threat_lon) == 0 or len(seg_lon) == 0:
+        return influence
+    seg_lon_r, seg_lat_r = np.radians(seg_lon)[:, None], np.radians(seg_lat)[:, None]
+    for start in range(0, len(threat_lon), THREAT_BLOCK_SIZE):
+        block = slice(start, start + THREAT_BLOCK_SIZE)
+        t_lon_r, t_lat_r = np.radians(threat_lon[block])[None, :], np.radians(threat_lat[block])[None, :]
+        # Haversine distance, vectorised over the (segments x threats) block
+        a = (np.sin((t_lat_r - seg_lat_r) / 2) ** 2
+             + np.cos(seg_lat_r) * np.cos(t_lat_r) * np.sin((t_lon_r - seg_lon_r) / 2) ** 2)
+        distance = 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+        influence += (distance <= THREAT_RADIUS_METERS) @ threat_weight[block]
+    return influence
+
+def load_threat_weights(db: Session, now: datetime):
+    """
+    Threat positions from the lookback window before `now` with an exponential time-decay
+    weight (1.0 for a brand-new threat). Threats after `now` are left out.
+    """
+    threats = [t for t in crud.get_recent_threat_points(db, now - timedelta(hours=settings.threat_lookback_hours))
+               if t.timestamp <= now]
+    lon = np.array([t.lon for t in threats], dtype=np.float64)
+    lat = np.array([t.lat for t in threats], dtype=np.float64)
+    age_hours = np.array([(now - t.timestamp).total_seconds() / 3600 for t in threats], dtype=np.float64)
+    weight = np.power(0.5, age_hours / settings.threat_decay_half_life_hours)
+    return lon, lat, weight
+
+def segment_threat_influence(db: Session, seg_lon, seg_lat, now: datetime) -> np.ndarray:
+    """Threat feature for segments with the given centroids, as of `now`."""
+    return decayed_threat_influence(np.asarray(seg_lon, dtype=np.float64), np.asarray(seg_lat, dtype=np.float64),
+                                    *load_threat_weights(db, now))
+
+def segment_feature_row(segment, influence: float) -> dict:
+    """Model input for a segment row or ORM object with terrain, class and elevation."""
+    return {
+        "terrain": segment.terrain_type,
+        "road_class": segment.road_classification,
+        "elevation": segment.elevation,
+        THREAT_FEATURE: float(influence),
+    }
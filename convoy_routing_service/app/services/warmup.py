@@ -0,0 +1,103 @@
+import threading
+import time
+from datetime import datetime
+from ..db import database
+from . import ml_engine, route_optimizer
+from .alert_pipeline import alert_pipeline
+
+class WarmupState:
+    """Tracks the startup warmup so the readiness probe can report progress per step."""
+    def __init__(self):
+        self.steps: dict[str, dict] = {}
+        self.started_at: datetime | None = None
+        self.finished_at: datetime | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.finished_at is not None and all(step["status"] == "ok" for step in self.steps.values())
+
+    def mark(self, name: str, status: str, **details):
+        with self._lock:
+            self.steps[name] = {"status": status, **details}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "steps": {name: dict(step) for name, step in self.steps.items()},
+            }
+
+warmup_state = WarmupState()
+
+def _warm_graph():
+    if not route_optimizer.has_snapshot():
+        return {"mode": "tiles"} # Corridor tiles are loaded on demand by route requests
+    db = database.SessionLocal()
+    try:
+        graph = route_optimizer.get_routing_graph(db)
+        return {"nodes": graph.node_count, "segments": graph.segment_count}
+    finally:
+        db.close()
+
+def _warm_model():
+    model = ml_engine.model_registry.current()
+    return {"version": model.version if model else None}
+
+def _warm_alert_count():
+    db = database.SessionLocal()
+    try:
+        return {"active_alerts": alert_pipeline.active_count(db)}
+    finally:
+        db.close()
+
+# Run in this order by run_warmup
+WARMUP_STEPS = [
+    ("graph", _warm_graph),
+    ("model", _warm_model),
+    ("alert_count", _warm_alert_count),
+]
+
+RETRY_INITIAL_SECONDS = 1.0
+RETRY_MAX_SECONDS = 60.0
+
+def _run_step(name: str, step, attempt: int) -> bool:
+    warmup_state.mark(name, "running", attempts=attempt)
+    started = time.perf_counter()
+    try:
+        details = step() or {}
+        warmup_state.mark(name, "ok", attempts=attempt, seconds=round(time.perf_counter() - started, 3), **details)
+        return True
+    except Exception as e:
+        warmup_state.mark(name, "failed", attempts=attempt, seconds=round(time.perf_counter() - started, 3), error=str(e))
+        print(f"Warmup step '{name}' failed (attempt {attempt}): {e}")
+        return False
+
+def run_warmup():
+    """
+    Runs every warmup step in order, recording timing and failures instead of raising, then
+    retries the failed steps with exponential backoff until all succeed. The worker stays
+    not ready (503 from /ready) until then, e.g. while the database is unreachable at boot.
+    """
+    warmup_state.started_at = datetime.utcnow()
+    for name, _ in WARMUP_STEPS:
+        warmup_state.mark(name, "pending")
+    attempts = {name: 1 for name, _ in WARMUP_STEPS}
+    pending = [(name, step) for name, step in WARMUP_STEPS if not _run_step(name, step, 1)]
+    delay = RETRY_INITIAL_SECONDS
+    while pending:
+        time.sleep(delay)
+        delay = min(delay * 2, RETRY_MAX_SECONDS)
+        retry, pending = pending, []
+        for name, step in retry:
+            attempts[name] += 1
+            if not _run_step(name, step, attempts[name]):
+                pending.append((name, step))
+    warmup_state.finished_at = datetime.utcnow()
+
+def start_warmup() -> threading.Thread:
+    thread = threading.Thread(target=run_warmup, name="warmup", daemon=True)
+    thread.start()
+    return thread
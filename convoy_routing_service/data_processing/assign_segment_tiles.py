@@ -0,0 +1,38 @@
+import os
+import sys
+from sqlalchemy import inspect, text
+
+# Add app path to be able to import modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.core.config import settings
+from app.db import crud
+from app.db.database import SessionLocal, engine
+from app.services.graph_tiles import TILE_COLUMNS
+
+def ensure_tile_column():
+    """Adds road_segments.tile_id to databases created before spatial tiling."""
+    columns = {column["name"] for column in inspect(engine).get_columns("road_segments")}
+    if "tile_id" in columns:
+        return
+    print("Adding road_segments.tile_id column...")
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE road_segments ADD COLUMN tile_id INTEGER"))
+        conn.execute(text("CREATE INDEX ix_road_segments_tile_id ON road_segments (tile_id)"))
+
+def main():
+    # Pass --all to recompute every segment, e.g. after changing TILE_SIZE_DEGREES
+    only_missing = "--all" not in sys.argv[1:]
+    print(f"Assigning {settings.tile_size_degrees} degree tiles to road segments...")
+    db = SessionLocal()
+    try:
+        ensure_tile_column()
+        updated = crud.assign_segment_tiles(db, settings.tile_size_degrees, TILE_COLUMNS, only_missing=only_missing)
+        print(f"Assigned tiles to {updated} road segments.")
+    except Exception as e:
+        db.rollback()
+        print(f"Failed to assign tiles. Error: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import os
+import sys
+
+# Add app path to be able to import modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.services import route_optimizer
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else settings.graph_snapshot_path
+    print(f"Exporting road graph snapshot to {path}...")
+    db = SessionLocal()
+    try:
+        graph = route_optimizer.export_graph_snapshot(db, path)
+        print(f"Exported {graph.node_count} nodes and {graph.segment_count} segments "
+              f"({graph.nbytes / 1_048_576:.1f} MiB).")
+    except Exception as e:
+        print(f"Failed to export graph snapshot. Error: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from app.db.database import Base, engine, SessionLocal
 from app.db.models import RoadSegment
+from app.services.graph_tiles import tile_id_for_point
 
 def main():
     print("Loading processed data into the database...")
@@ -22,13 +23,15 @@ def main():
         for _, row in gdf.iterrows():
             # Calculate geographic length in meters
             length_meters = db.query(ST_Length(row['geometry'].wkt.cast(Geography))).scalar()
+            centroid = row['geometry'].centroid
             
             segment = RoadSegment(
                 geometry=row['geometry'].wkt,
                 length=length_meters,
                 terrain_type=row['terrain'],
                 road_classification=row['road_class'],
-                elevation=row['elevation']
+                elevation=row['elevation'],
+                tile_id=tile_id_for_point(centroid.x, centroid.y)
             )
             db.add(segment)
             
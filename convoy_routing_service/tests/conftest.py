@@ -0,0 +1,5 @@
+import os
+
+# Settings are read at import time; tests never touch a real database
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
@@ -0,0 +1,30 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.risk_feed import RiskEvent, risk_feed
+
+def make_event(version: int) -> RiskEvent:
+    return RiskEvent(version, 7, 0.8, "High", 77.1, 28.6)
+
+def test_batch_arriving_with_client_message_is_delivered():
+    client = TestClient(app) # Not used as a context manager, so the lifespan (DB, scheduler) never runs
+    with client.websocket_connect("/api/v1/ws/risk_feed") as ws:
+        assert ws.receive_json()["type"] == "hello"
+        # A client message and a queued batch complete in the same wait
+        ws.send_text("ping")
+        risk_feed._fan_out([make_event(risk_feed.version + 1)])
+        message = ws.receive_json()
+        assert message == {"type": "delta", "events": [[risk_feed.version, 7, 0.8, "High"]]}
+
+        # The handler keeps serving after handling both
+        ws.send_text("ping")
+        risk_feed._fan_out([make_event(risk_feed.version + 1)])
+        assert ws.receive_json()["events"][0][0] == risk_feed.version
+
+def test_resume_skips_events_already_seen():
+    client = TestClient(app)
+    risk_feed._fan_out([make_event(risk_feed.version + 1), make_event(risk_feed.version + 2)])
+    since = risk_feed.version - 1
+    with client.websocket_connect(f"/api/v1/ws/risk_feed?since={since}") as ws:
+        assert ws.receive_json()["type"] == "hello"
+        message = ws.receive_json()
+        assert [event[0] for event in message["events"]] == [risk_feed.version]
@@ -0,0 +1,203 @@
+"""
+Replays a configurable mix of convoy operations against a running instance and
+reports throughput, latency percentiles and error rates per endpoint.
+
+Install its client dependencies with `pip install -r tools/requirements.txt`.
+
+Example:
+    python tools/load_generator.py --base-url http://localhost:8000 \
+        --username commander --password secret --duration 60 --concurrency 32 \
+        --mix route=60,threat=5,alerts=35 --ws-subscribers 20 --risk-feed-subscribers 10
+
+The user must be able to call every endpoint in the mix (a commander can).
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from collections import defaultdict
+import httpx
+import websockets
+
+API_PREFIX = "/api/v1"
+DEFAULT_MIX = "route=60,threat=5,alerts=35"
+DEFAULT_BBOX = "77.0,28.4,77.4,28.8" # min_lon,min_lat,max_lon,max_lat
+THREAT_CLASSIFICATIONS = ["ied", "ambush", "roadblock", "sniper", "unknown"]
+THREAT_SOURCES = ["sigint", "uav", "humint", "manual"]
+ROUTE_MODES = ["stealth", "speed", "balance"]
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.errors = 0
+        self.status_codes: dict[str, int] = defaultdict(int)
+        self.messages = 0 # WebSocket messages received
+
+    def record(self, latency: float, status: str, ok: bool):
+        self.latencies.append(latency)
+        self.status_codes[status] += 1
+        if not ok:
+            self.errors += 1
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return math.nan
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def parse_mix(mix: str) -> dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = int(weight)
+    unknown = set(weights) - set(OPERATIONS)
+    if unknown:
+        raise SystemExit(f"Unknown operations in --mix: {', '.join(sorted(unknown))}")
+    return weights
+
+def random_point(bbox: tuple[float, float, float, float]) -> tuple[float, float]:
+    return random.uniform(bbox[0], bbox[2]), random.uniform(bbox[1], bbox[3])
+
+# --- HTTP operations: each returns (endpoint name, httpx request coroutine) ---
+def op_route(client: httpx.AsyncClient, args):
+    (start_lon, start_lat), (end_lon, end_lat) = random_point(args.bbox), random_point(args.bbox)
+    payload = {"start_lat": start_lat, "start_lon": start_lon, "end_lat": end_lat, "end_lon": end_lon,
+               "mode": random.choice(ROUTE_MODES), "compact": args.compact_routes}
+    return "POST /get_route", client.post(f"{API_PREFIX}/get_route", json=payload)
+
+def op_threat(client: httpx.AsyncClient, args):
+    lon, lat = random_point(args.bbox)
+    payload = {"lat": lat, "lon": lon, "classification": random.choice(THREAT_CLASSIFICATIONS),
+               "source_type": random.choice(THREAT_SOURCES), "verified_status": "confirmed"}
+    return "POST /update_threat", client.post(f"{API_PREFIX}/update_threat", json=payload)
+
+def op_alerts(client: httpx.AsyncClient, args):
+    return "GET /alerts", client.get(f"{API_PREFIX}/alerts")
+
+OPERATIONS = {"route": op_route, "threat": op_threat, "alerts": op_alerts}
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post(f"{API_PREFIX}/login", data={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+async def http_worker(client: httpx.AsyncClient, args, weights: dict[str, int], stats, deadline: float):
+    names, cumulative = list(weights), list(weights.values())
+    while time.monotonic() < deadline:
+        name, request = OPERATIONS[random.choices(names, cumulative)[0]](client, args)
+        started = time.perf_counter()
+        try:
+            response = await request
+            stats[name].record(time.perf_counter() - started, str(response.status_code), response.is_success)
+        except httpx.HTTPError as e:
+            stats[name].record(time.perf_counter() - started, type(e).__name__, False)
+        if args.think_time:
+            await asyncio.sleep(random.expovariate(1 / args.think_time))
+
+async def websocket_subscriber(url: str, name: str, stats, deadline: float):
+    """Holds one WebSocket open until the deadline, timing the handshake and counting messages."""
+    started = time.perf_counter()
+    try:
+        async with websockets.connect(url, open_timeout=10) as ws:
+            stats[name].record(time.perf_counter() - started, "connected", True)
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    await asyncio.wait_for(ws.recv(), timeout=remaining)
+                    stats[name].messages += 1
+                except asyncio.TimeoutError:
+                    break
+                except websockets.ConnectionClosed:
+                    break # Closed by the server after connecting; already counted as connected
+    except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+        stats[name].record(time.perf_counter() - started, type(e).__name__, False)
+
+def print_report(stats, elapsed: float):
+    header = f"{'endpoint':<28}{'count':>8}{'rps':>9}{'err%':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for name in sorted(stats):
+        s = stats[name]
+        latencies = sorted(s.latencies)
+        count = len(latencies)
+        error_rate = 100 * s.errors / count if count else 0.0
+        print(f"{name:<28}{count:>8}{count / elapsed:>9.1f}{error_rate:>8.2f}"
+              f"{percentile(latencies, 50) * 1000:>10.1f}{percentile(latencies, 90) * 1000:>10.1f}"
+              f"{percentile(latencies, 99) * 1000:>10.1f}{(latencies[-1] if latencies else math.nan) * 1000:>10.1f}")
+        codes = ", ".join(f"{code}: {n}" for code, n in sorted(s.status_codes.items()))
+        extra = f"; {s.messages} messages received" if name.startswith("WS") else ""
+        print(f"{'':<28}{codes}{extra}")
+
+def report_json(stats, elapsed: float) -> dict:
+    result = {}
+    for name, s in stats.items():
+        latencies = sorted(s.latencies)
+        result[name] = {
+            "count": len(latencies),
+            "throughput_rps": len(latencies) / elapsed,
+            "errors": s.errors,
+            "error_rate": s.errors / len(latencies) if latencies else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p90_ms": percentile(latencies, 90) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "status_codes": dict(s.status_codes),
+            "messages": s.messages,
+        }
+    return {"elapsed_seconds": elapsed, "endpoints": result}
+
+async def run(args):
+    weights = parse_mix(args.mix)
+    stats: dict[str, EndpointStats] = defaultdict(EndpointStats)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        token = await login(client, args.username, args.password)
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        ws_base = args.base_url.replace("http://", "ws://", 1).replace("https://", "wss://", 1)
+        started = time.monotonic()
+        deadline = started + args.duration
+        tasks = [asyncio.create_task(http_worker(client, args, weights, stats, deadline))
+                 for _ in range(args.concurrency)]
+        tasks += [asyncio.create_task(websocket_subscriber(
+                      f"{ws_base}{API_PREFIX}/ws/convoy_updates/{uuid.uuid4()}", "WS /ws/convoy_updates", stats, deadline))
+                  for _ in range(args.ws_subscribers)]
+        bbox = ",".join(str(v) for v in args.bbox)
+        tasks += [asyncio.create_task(websocket_subscriber(
+                      f"{ws_base}{API_PREFIX}/ws/risk_feed?bbox={bbox}", "WS /ws/risk_feed", stats, deadline))
+                  for _ in range(args.risk_feed_subscribers)]
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - started
+
+    if args.json:
+        print(json.dumps(report_json(stats, elapsed), indent=2))
+    else:
+        print_report(stats, elapsed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the convoy routing API.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent HTTP workers (closed loop)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Relative weights, e.g. route=60,threat=5,alerts=35")
+    parser.add_argument("--ws-subscribers", type=int, default=0, help="Convoy update WebSockets to hold open")
+    parser.add_argument("--risk-feed-subscribers", type=int, default=0, help="Risk feed WebSockets to hold open")
+    parser.add_argument("--bbox", default=DEFAULT_BBOX, help="min_lon,min_lat,max_lon,max_lat for random points")
+    parser.add_argument("--compact-routes", action="store_true", help="Request compact route responses")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between a worker's requests (s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout (s)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+    args.bbox = tuple(float(v) for v in args.bbox.split(","))
+    if len(args.bbox) != 4:
+        parser.error("--bbox needs four comma-separated numbers")
+    random.seed(args.seed)
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()